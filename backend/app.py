@@ -10,7 +10,7 @@ from pathlib import Path
 
 from fastapi import FastAPI, File, UploadFile, HTTPException, Depends, Request
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import JSONResponse, HTMLResponse
+from fastapi.responses import JSONResponse, HTMLResponse, StreamingResponse
 from fastapi.security import HTTPBearer
 from pydantic import BaseModel, Field, field_validator
 import uvicorn
@@ -18,7 +18,8 @@ from dotenv import load_dotenv
 
 from ingest import DocumentIngestor
 from retriever import LegalRetriever
-from llm import LegalLLM
+from llm import LegalLLM, load_warmup_queries
+from llm_http import close_client
 from sources.indiacode import IndiaCodeDownloader
 from vlm_config import vlm_configurator, VLMQuality, get_vlm_configuration_info
 from ai_adaptive import adaptive_ai, get_ai_status, get_ai_capability_level, estimate_success_rates
@@ -28,6 +29,8 @@ from security import (
     FileSecurityValidator, SecureEnvironment
 )
 from rate_limiter import RateLimitMiddleware
+from utils import fastjson
+from utils.aio import configure_default_executor
 
 # Load environment variables
 load_dotenv()
@@ -60,6 +63,7 @@ app.add_middleware(
 ingestor: Optional[DocumentIngestor] = None
 retriever: Optional[LegalRetriever] = None
 llm: Optional[LegalLLM] = None
+warmup_task: Optional[asyncio.Task] = None
 
 class QueryRequest(BaseModel):
     question: str = Field(..., description="Legal question to ask", min_length=1, max_length=10000)
@@ -178,11 +182,14 @@ class JudgmentResponse(BaseModel):
 
 async def startup_event():
     """Initialize components on startup"""
-    global ingestor, retriever, llm
+    global ingestor, retriever, llm, warmup_task
     
     try:
         logger.info("Initializing backend components...")
         
+        # Model inference and other blocking calls run in this pool
+        configure_default_executor()
+        
         # Initialize document ingestor
         ingestor = DocumentIngestor()
         
@@ -193,18 +200,43 @@ async def startup_event():
         # Initialize LLM
         llm = LegalLLM()
         await llm.initialize()
+        llm.set_query_embedder(retriever.embed_query)
         
         # Connect ingestor to retriever
         ingestor.set_retriever(retriever)
         
+        # Warm the answer cache with common questions in the background
+        if llm.config.warmup_file:
+            try:
+                queries = [
+                    (InputValidator.sanitize_query(question), language)
+                    for question, language in load_warmup_queries(llm.config.warmup_file)
+                ]
+                warmup_task = asyncio.create_task(llm.warmup(queries, search=retriever.search))
+                logger.info(f"Scheduled LLM warmup for {len(queries)} queries")
+            except Exception as e:
+                logger.warning(f"Could not load LLM warmup file: {e}")
+        
         logger.info("Backend initialization complete")
         
     except Exception as e:
         logger.error(f"Failed to initialize backend: {e}")
         raise
 
-# Register startup event
+async def shutdown_event():
+    """Release shared resources on shutdown"""
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    if llm:
+        await llm.aclose()
+    if retriever:
+        # Persist additions still waiting on the save debounce
+        await retriever.flush()
+    await close_client()
+
+# Register startup and shutdown events
 app.add_event_handler("startup", startup_event)
+app.add_event_handler("shutdown", shutdown_event)
 
 @app.get("/health")
 async def health_check():
@@ -324,17 +356,22 @@ async def ask_question(request: QueryRequest):
         if not retriever or not llm:
             raise HTTPException(status_code=503, detail="Components not initialized")
         
+        # Embed the question once for both dense retrieval and the answer cache
+        query_embedding = await retriever.embed_query(request.question)
+        
         # Retrieve relevant documents
         results = await retriever.search(
             query=request.question,
-            max_results=request.max_results
+            max_results=request.max_results,
+            query_embedding=query_embedding
         )
         
         # Generate answer with citations
         answer = await llm.generate_answer(
             question=request.question,
             sources=results,
-            language=request.language
+            language=request.language,
+            question_embedding=query_embedding
         )
         
         return QueryResponse(
@@ -347,6 +384,51 @@ async def ask_question(request: QueryRequest):
         logger.error(f"Failed to answer question: {e}")
         raise HTTPException(status_code=500, detail=str(e))
 
+@app.post("/ask/stream")
+async def ask_question_stream(request: QueryRequest):
+    """Answer legal questions, streaming the answer as server-sent events"""
+    if not retriever or not llm:
+        raise HTTPException(status_code=503, detail="Components not initialized")
+    
+    # Retrieve before streaming so retrieval errors still return a status code
+    try:
+        query_embedding = await retriever.embed_query(request.question)
+        results = await retriever.search(
+            query=request.question,
+            max_results=request.max_results,
+            query_embedding=query_embedding
+        )
+    except Exception as e:
+        logger.error(f"Failed to retrieve sources: {e}")
+        raise HTTPException(status_code=500, detail=str(e))
+    
+    async def events():
+        # The response pulls from this generator as the client reads, so a
+        # slow client slows generation instead of buffering it
+        try:
+            async for chunk in llm.generate_answer_stream(
+                question=request.question,
+                sources=results,
+                language=request.language,
+                question_embedding=query_embedding
+            ):
+                yield b"data: " + fastjson.dumps({"delta": chunk}) + b"\n\n"
+            
+            sources = [
+                {
+                    "filename": source.get("filename", "Unknown"),
+                    "chunk_id": source.get("chunk_id"),
+                    "score": float(source.get("combined_score", 0))
+                }
+                for source in results
+            ]
+            yield b"data: " + fastjson.dumps({"done": True, "sources": sources}) + b"\n\n"
+        except Exception as e:
+            logger.error(f"Failed to stream answer: {e}")
+            yield b"data: " + fastjson.dumps({"error": "Answer generation failed"}) + b"\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream")
+
 @app.post("/summarize", response_model=SummaryResponse)
 async def summarize_document(request: SummarizeRequest):
     """Generate structured summary of a legal document"""
@@ -546,7 +628,8 @@ async def get_ai_status():
                 "openai_api": "openai" in ai_status["available_components"],
                 "basic_functionality": True,
                 "document_processing": True
-            }
+            },
+            "llm_cache": llm.stats() if llm else None
         }
         
     except Exception as e:
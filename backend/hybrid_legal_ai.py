@@ -16,8 +16,9 @@ from transformers import (
 )
 import httpx
 
+from utils.aio import run_blocking
 from utils.textnorm import normalize_text, is_devanagari_text
-from offline_model_loader import model_loader
+from offline_model_loader import get_model_loader
 
 logger = logging.getLogger(__name__)
 
@@ -38,6 +39,7 @@ class ContextualEncoder:
         self.model_name = model_name
         self.tokenizer = None
         self.model = None
+        self.batched = None
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
     
     async def initialize(self):
@@ -46,7 +48,7 @@ class ContextualEncoder:
             logger.info(f"Initializing contextual encoder with {self.model_name}")
             
             # Try to load from offline model loader (bundled or cached)
-            self.tokenizer, self.model = model_loader.load_inlegalbert()
+            self.tokenizer, self.model = get_model_loader().get_model("inlegalbert")
             
             if self.tokenizer is None or self.model is None:
                 raise Exception("InLegalBERT model not available")
@@ -54,6 +56,9 @@ class ContextualEncoder:
             self.model.to(self.device)
             self.model.eval()
             
+            # Concurrent encodes share one padded forward pass
+            self.batched = get_model_loader().get_batched_model("inlegalbert")
+            
             logger.info("Contextual encoder initialized successfully")
             
         except Exception as e:
@@ -79,33 +84,12 @@ class ContextualEncoder:
             # Normalize and prepare text
             normalized_text = normalize_text(text)
             
-            # Tokenize input
-            inputs = self.tokenizer(
-                normalized_text,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=512
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Get contextual embeddings
-            with torch.no_grad():
-                outputs = self.model(**inputs)
-                
-                # Extract rich contextual features
-                last_hidden_states = outputs.last_hidden_state
-                pooled_output = outputs.pooler_output if hasattr(outputs, 'pooler_output') else None
-                
-                # Attention-weighted pooling
-                attention_mask = inputs["attention_mask"]
-                mask_expanded = attention_mask.unsqueeze(-1).expand(last_hidden_states.size()).float()
-                sum_embeddings = torch.sum(last_hidden_states * mask_expanded, 1)
-                sum_mask = torch.clamp(mask_expanded.sum(1), min=1e-9)
-                mean_pooled = sum_embeddings / sum_mask
-                
-                # Extract attention patterns for legal reasoning
-                attention_weights = self._extract_attention_patterns(last_hidden_states, attention_mask)
+            # Forward pass runs in a worker thread so it doesn't block the loop
+            if self.batched is not None:
+                last_hidden_states, attention_mask = await self.batched(normalized_text)
+                mean_pooled, attention_weights = self._pool(last_hidden_states, attention_mask)
+            else:
+                mean_pooled, attention_weights = await run_blocking(self._encode_sync, normalized_text)
             
             # Analyze legal concepts
             legal_concepts = await self._analyze_legal_concepts(normalized_text, mean_pooled)
@@ -131,6 +115,38 @@ class ContextualEncoder:
             logger.error(f"Contextual encoding failed: {e}")
             raise
     
+    def _encode_sync(self, normalized_text: str) -> Tuple[torch.Tensor, Dict[str, Any]]:
+        """Tokenize and run InLegalBERT; returns mean-pooled embeddings and attention patterns"""
+        # Tokenize input
+        inputs = self.tokenizer(
+            normalized_text,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=512
+        )
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        # Get contextual embeddings
+        with torch.no_grad():
+            outputs = self.model(**inputs)
+            
+            # Extract rich contextual features
+            return self._pool(outputs.last_hidden_state, inputs["attention_mask"])
+    
+    def _pool(self, last_hidden_states: torch.Tensor, attention_mask: torch.Tensor) -> Tuple[torch.Tensor, Dict[str, Any]]:
+        """Masked mean pooling plus attention patterns over encoder output"""
+        # Attention-weighted pooling
+        mask_expanded = attention_mask.unsqueeze(-1).expand(last_hidden_states.size()).float()
+        sum_embeddings = torch.sum(last_hidden_states * mask_expanded, 1)
+        sum_mask = torch.clamp(mask_expanded.sum(1), min=1e-9)
+        mean_pooled = sum_embeddings / sum_mask
+        
+        # Extract attention patterns for legal reasoning
+        attention_weights = self._extract_attention_patterns(last_hidden_states, attention_mask)
+        
+        return mean_pooled, attention_weights
+    
     def _extract_attention_patterns(self, hidden_states: torch.Tensor, attention_mask: torch.Tensor) -> Dict[str, Any]:
         """Extract attention patterns for legal reasoning insights"""
         try:
@@ -276,7 +292,7 @@ class GenerativeDecoder:
             # Initialize T5 for encoder-decoder tasks
             try:
                 logger.info("Loading T5 model...")
-                self.t5_tokenizer, self.t5_model = model_loader.load_t5_model()
+                self.t5_tokenizer, self.t5_model = get_model_loader().get_model("t5")
                 
                 if self.t5_tokenizer and self.t5_model:
                     self.t5_model.to(self.device)
@@ -290,7 +306,7 @@ class GenerativeDecoder:
             # Initialize XLNet for autoregressive+bidirectional tasks
             try:
                 logger.info("Loading XLNet model...")
-                self.xlnet_tokenizer, self.xlnet_model = model_loader.load_xlnet_model()
+                self.xlnet_tokenizer, self.xlnet_model = get_model_loader().get_model("xlnet")
                 
                 if self.xlnet_tokenizer and self.xlnet_model:
                     self.xlnet_model.to(self.device)
@@ -433,30 +449,8 @@ class GenerativeDecoder:
             # Create T5 task-specific prompt
             task_prompt = self._create_t5_prompt(context, query, gen_type)
             
-            # Tokenize input
-            inputs = self.t5_tokenizer(
-                task_prompt,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=512
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Generate with T5
-            with torch.no_grad():
-                outputs = self.t5_model.generate(
-                    **inputs,
-                    max_length=500,
-                    num_beams=4,
-                    early_stopping=True,
-                    do_sample=True,
-                    temperature=0.7,
-                    top_p=0.9
-                )
-            
-            # Decode generated text
-            generated_text = self.t5_tokenizer.decode(outputs[0], skip_special_tokens=True)
+            # Generation runs in a worker thread so it doesn't block the loop
+            generated_text = await run_blocking(self._t5_generate_sync, task_prompt)
             
             return {
                 "text": generated_text,
@@ -470,6 +464,33 @@ class GenerativeDecoder:
             logger.error(f"T5 generation failed: {e}")
             raise
     
+    def _t5_generate_sync(self, task_prompt: str) -> str:
+        """Tokenize, generate and decode with T5"""
+        # Tokenize input
+        inputs = self.t5_tokenizer(
+            task_prompt,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=512
+        )
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        # Generate with T5
+        with torch.no_grad():
+            outputs = self.t5_model.generate(
+                **inputs,
+                max_length=500,
+                num_beams=4,
+                early_stopping=True,
+                do_sample=True,
+                temperature=0.7,
+                top_p=0.9
+            )
+        
+        # Decode generated text
+        return self.t5_tokenizer.decode(outputs[0], skip_special_tokens=True)
+    
     async def _generate_with_xlnet(
         self, 
         context: Dict[str, Any], 
@@ -481,33 +502,8 @@ class GenerativeDecoder:
             # Create XLNet prompt with contextual information
             xlnet_prompt = self._create_xlnet_prompt(context, query, gen_type)
             
-            # Tokenize
-            inputs = self.xlnet_tokenizer(
-                xlnet_prompt,
-                return_tensors="pt",
-                padding=True,
-                truncation=True,
-                max_length=400
-            )
-            inputs = {k: v.to(self.device) for k, v in inputs.items()}
-            
-            # Generate with XLNet
-            with torch.no_grad():
-                outputs = self.xlnet_model.generate(
-                    inputs["input_ids"],
-                    attention_mask=inputs["attention_mask"],
-                    max_length=inputs["input_ids"].shape[1] + 200,
-                    num_beams=3,
-                    early_stopping=True,
-                    do_sample=True,
-                    temperature=0.8,
-                    top_p=0.95,
-                    pad_token_id=self.xlnet_tokenizer.pad_token_id
-                )
-            
-            # Extract only the generated part
-            generated_ids = outputs[0][inputs["input_ids"].shape[1]:]
-            generated_text = self.xlnet_tokenizer.decode(generated_ids, skip_special_tokens=True)
+            # Generation runs in a worker thread so it doesn't block the loop
+            generated_text = await run_blocking(self._xlnet_generate_sync, xlnet_prompt)
             
             return {
                 "text": generated_text,
@@ -522,6 +518,36 @@ class GenerativeDecoder:
             logger.error(f"XLNet generation failed: {e}")
             raise
     
+    def _xlnet_generate_sync(self, xlnet_prompt: str) -> str:
+        """Tokenize, generate and decode the continuation with XLNet"""
+        # Tokenize
+        inputs = self.xlnet_tokenizer(
+            xlnet_prompt,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=400
+        )
+        inputs = {k: v.to(self.device) for k, v in inputs.items()}
+        
+        # Generate with XLNet
+        with torch.no_grad():
+            outputs = self.xlnet_model.generate(
+                inputs["input_ids"],
+                attention_mask=inputs["attention_mask"],
+                max_length=inputs["input_ids"].shape[1] + 200,
+                num_beams=3,
+                early_stopping=True,
+                do_sample=True,
+                temperature=0.8,
+                top_p=0.95,
+                pad_token_id=self.xlnet_tokenizer.pad_token_id
+            )
+        
+        # Extract only the generated part
+        generated_ids = outputs[0][inputs["input_ids"].shape[1]:]
+        return self.xlnet_tokenizer.decode(generated_ids, skip_special_tokens=True)
+    
     async def _generate_fallback(
         self, 
         context: Dict[str, Any], 
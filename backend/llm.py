@@ -3,56 +3,642 @@ LLM integration for legal question answering and judgment generation
 """
 import os
 import re
-import json
+import copy
+import random
+import hashlib
 import logging
-from typing import List, Dict, Any, Optional
+import functools
+import contextlib
+from itertools import zip_longest
+from dataclasses import dataclass
+from typing import List, Dict, Any, Optional, Callable, Awaitable, Tuple, AsyncIterator, TYPE_CHECKING
 import httpx
 import asyncio
 
+from llm_http import get_client, iter_sse_events
+from utils import fastjson
+from utils.aio import run_blocking
+from utils.batching import MicroBatcher
+from utils.cache import LRUCache, SemanticCache
+from utils.disk_cache import SQLiteCache
+from utils.throttle import AsyncTokenBucket
 from utils.textnorm import is_devanagari_text
-from hybrid_legal_ai import HybridLegalAI, create_hybrid_legal_ai
+
+try:
+    import tiktoken
+    TIKTOKEN_AVAILABLE = True
+except ImportError:
+    TIKTOKEN_AVAILABLE = False
 from smart_ai_fallback import get_ai_response_with_fallback, get_ai_tier_status
 
+# hybrid_legal_ai pulls in torch/transformers; it is imported in
+# initialize() only when hybrid mode is enabled
+if TYPE_CHECKING:
+    from hybrid_legal_ai import HybridLegalAI
+
 logger = logging.getLogger(__name__)
 
+# LLM responses larger than this are decoded in a worker thread
+_JSON_OFFLOAD_THRESHOLD = 2048
+
+# Hybrid results with more reasoning steps than this are formatted in a worker thread
+_FORMAT_OFFLOAD_STEPS = 20
+
+# Expected shape of LLM JSON output, mirroring the API response models.
+# A (container, item_type) tuple also checks the items/values.
+_SUMMARY_SCHEMA = {
+    "facts": str,
+    "issues": (list, str),
+    "arguments": str,
+    "holding": str,
+    "relief": str
+}
+_JUDGMENT_SCHEMA_FIELDS = {
+    "metadata": dict,
+    "framing": str,
+    "points_for_determination": (list, str),
+    "applicable_law": (dict, list),
+    "arguments": (dict, str),
+    "court_analysis": (list, dict),
+    "findings": (list, str),
+    "relief": dict,
+    "prediction": dict,
+    "limitations": (list, str)
+}
+
+def _redact_error(error: Exception) -> str:
+    """Error text with any API key masked"""
+    error_msg = str(error)
+    if "sk-" in error_msg:
+        error_msg = _SK_RE.sub('sk-****', error_msg)
+    return error_msg
+
+def _matches_type(value: Any, spec: Any) -> bool:
+    if isinstance(spec, tuple):
+        container, item_type = spec
+        if not isinstance(value, container):
+            return False
+        items = value.values() if container is dict else value
+        return all(isinstance(item, item_type) for item in items)
+    return isinstance(value, spec)
+
+def _validate_fields(
+    data: Any,
+    schema: Dict[str, Any],
+    defaults: Dict[str, Any]
+) -> Tuple[Dict[str, Any], bool]:
+    """
+    Project decoded LLM JSON onto a schema
+    
+    Fields that are missing or of the wrong type are taken from defaults.
+    Returns the cleaned dict and whether every field was valid.
+    """
+    if not isinstance(data, dict):
+        return dict(defaults), False
+    
+    result = {}
+    valid = True
+    for field, spec in schema.items():
+        value = data.get(field)
+        if _matches_type(value, spec):
+            result[field] = value
+        else:
+            result[field] = defaults[field]
+            valid = False
+    return result, valid
+
+# Batch window used when dynamic batching is enabled without LLM_BATCH_WINDOW_MS
+_DEFAULT_BATCH_WINDOW_MS = 2.0
+
+# Transport errors from a stale pooled connection; safe to retry once
+_TRANSIENT_HTTP_ERRORS = (httpx.RemoteProtocolError, httpx.ReadError)
+
+# Provider responses worth retrying with backoff: rate limits and overload
+_RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+
+# Chars per token when tiktoken is not installed; conservative for English
+_CHARS_PER_TOKEN = 4
+
+@functools.lru_cache(maxsize=8)
+def _token_counter(model: str) -> Callable[[str], int]:
+    """Token counting function for a model; approximate without tiktoken"""
+    if TIKTOKEN_AVAILABLE:
+        try:
+            encoding = tiktoken.encoding_for_model(model)
+        except KeyError:
+            encoding = tiktoken.get_encoding("cl100k_base")
+        return lambda text: len(encoding.encode(text, disallowed_special=()))
+    return lambda text: len(text) // _CHARS_PER_TOKEN + 1
+
+# Devanagari block; a miss means the sample cannot be Hindi
+_DEVA_RE = re.compile(r'[\u0900-\u097F]')
+
+# Leading characters inspected for language auto-detection
+_LANG_SAMPLE_CHARS = 2048
+
+@functools.lru_cache(maxsize=1024)
+def _sample_language(sample: str) -> str:
+    """
+    Script-based language of a text sample, memoised for repeated documents
+
+    The regex scan short-circuits the common all-Latin case before the
+    Devanagari ratio check.
+    """
+    if not _DEVA_RE.search(sample):
+        return "en"
+    return "hi" if is_devanagari_text(sample) else "en"
+
+# Concept keyword -> (applicable_law category, laws); first match wins
+_CONCEPT_MAP = {
+    "criminal_law": ("statutes", ("Indian Penal Code, 1860", "Code of Criminal Procedure, 1973")),
+    "constitutional_law": ("constitutional", ("Constitution of India",)),
+    "procedural_law": ("statutes", ("Code of Criminal Procedure, 1973", "Indian Evidence Act, 1872")),
+    "civil_law": ("statutes", ("Indian Contract Act, 1872", "Transfer of Property Act, 1882")),
+}
+
+# Section templates for _format_hybrid_response
+_HYBRID_QUALITY_TEMPLATE = (
+    "\n\n**Analysis Quality:**\n"
+    "- Contextual Understanding: {confidence:.2f}\n"
+    "- Hybrid Model Score: {hybrid:.2f}\n"
+    "- Legal Complexity: {complexity:.2f}"
+)
+_HYBRID_CITATION_TEMPLATE = "[{index}] {filename} (Relevance: {relevance_score:.2f})"
+
+# Concept keyword -> case type, in priority order
+_CASE_TYPE_PRIORITY = (
+    ("criminal_law", "criminal"),
+    ("constitutional_law", "constitutional"),
+    ("civil_law", "civil"),
+)
+
+# API keys to redact from logged errors (includes sk-proj-... style keys)
+_SK_RE = re.compile(r'sk-[A-Za-z0-9_-]+')
+
+# Prompt templates. Static instructions go in the system message so repeat
+# calls share a byte-identical prefix (provider-side prompt caching); only
+# the user message varies and is filled with str.format_map.
+_QA_SYSTEM_HI = """आप एक भारतीय कानूनी विशेषज्ञ हैं। दिए गए संदर्भ के आधार पर प्रश्न का उत्तर दें।
+
+निर्देश:
+- केवल दिए गए संदर्भ का उपयोग करें
+- उत्तर में [1], [2] आदि के रूप में उद्धरण शामिल करें
+- सटीक और संक्षिप्त उत्तर दें
+- यदि जानकारी उपलब्ध नहीं है तो स्पष्ट रूप से बताएं"""
+
+_QA_SYSTEM_EN = """You are an Indian legal expert. Answer the question based on the provided context.
+
+Instructions:
+- Use only the provided context
+- Include citations as [1], [2], etc. in your answer
+- Provide accurate and concise responses
+- If information is not available, clearly state so"""
+
+_QA_USER_HI = """संदर्भ:
+{context}
+
+प्रश्न: {question}
+
+उत्तर:"""
+
+_QA_USER_EN = """Context:
+{context}
+
+Question: {question}
+
+Answer:"""
+
+_SUMMARY_SYSTEM_HI = """निम्नलिखित कानूनी दस्तावेज़ का संरचित सारांश बनाएं।
+
+कृपया निम्नलिखित JSON प्रारूप में उत्तर दें:
+{
+    "facts": "मुख्य तथ्य",
+    "issues": ["कानूनी मुद्दे की सूची"],
+    "arguments": "पक्षों के तर्क",
+    "holding": "न्यायालय का निर्णय",
+    "relief": "राहत/आदेश"
+}"""
+
+_SUMMARY_SYSTEM_EN = """Provide a structured summary of the following legal document.
+
+Please respond in the following JSON format:
+{
+    "facts": "Key facts of the case",
+    "issues": ["List of legal issues"],
+    "arguments": "Arguments presented by parties",
+    "holding": "Court's decision/holding",
+    "relief": "Relief granted/orders issued"
+}"""
+
+_JUDGMENT_USER_HI = """मामले के तथ्य:
+{case_facts}
+
+कानूनी मुद्दे:
+{issues}
+
+संबंधित कानूनी संदर्भ:
+{context}"""
+
+_JUDGMENT_USER_EN = """Case Facts:
+{case_facts}
+
+Legal Issues:
+{issues}
+
+Relevant Legal Context:
+{context}"""
+
+# Judgment JSON schema, part of the static judgment system prompt
+_JUDGMENT_SCHEMA = """{
+    "metadata": {
+        "case_type": "civil/criminal/constitutional",
+        "jurisdiction": "Supreme Court/High Court/District Court",
+        "date": "YYYY-MM-DD"
+    },
+    "framing": "Brief framing of the case and jurisdiction",
+    "points_for_determination": ["List of legal points to be determined"],
+    "applicable_law": {
+        "constitutional": ["Relevant constitutional provisions"],
+        "statutes": ["Applicable statutes"],
+        "rules_regulations": ["Relevant rules and regulations"],
+        "precedents": ["Key precedent cases"]
+    },
+    "arguments": {
+        "petitioner": "Petitioner's main arguments",
+        "respondent": "Respondent's main arguments"
+    },
+    "court_analysis": [
+        {
+            "issue": "Legal issue being analyzed",
+            "analysis": "Court's reasoning",
+            "citations": ["Relevant case law and statutes"]
+        }
+    ],
+    "findings": ["Court's key findings"],
+    "relief": {
+        "final_order": "Final order of the court",
+        "directions": ["Specific directions issued"],
+        "costs": "Cost orders if any"
+    },
+    "prediction": {
+        "likely_outcome": "Most probable outcome",
+        "probabilities": {
+            "favor_petitioner": 0.0,
+            "favor_respondent": 0.0,
+            "partial_relief": 0.0
+        },
+        "drivers": ["Key factors influencing the outcome"]
+    },
+    "limitations": ["Limitations of this analysis"]
+}"""
+
+_JUDGMENT_SYSTEM_HI = """आप एक भारतीय न्यायाधीश हैं। निम्नलिखित मामले के लिए संरचित निर्णय तैयार करें।
+
+कृपया निम्नलिखित JSON संरचना में निर्णय प्रदान करें:
+
+""" + _JUDGMENT_SCHEMA
+
+_JUDGMENT_SYSTEM_EN = """You are an Indian judge. Draft a structured judgment for the following case.
+
+Please provide the judgment in the following JSON structure:
+
+""" + _JUDGMENT_SCHEMA
+
+# Prompts keyed by detected language; anything other than "hi" uses English
+_QA_SYSTEM_PROMPTS = {"hi": _QA_SYSTEM_HI, "en": _QA_SYSTEM_EN}
+_QA_USER_PROMPTS = {"hi": _QA_USER_HI, "en": _QA_USER_EN}
+_SUMMARY_SYSTEM_PROMPTS = {"hi": _SUMMARY_SYSTEM_HI, "en": _SUMMARY_SYSTEM_EN}
+_JUDGMENT_SYSTEM_PROMPTS = {"hi": _JUDGMENT_SYSTEM_HI, "en": _JUDGMENT_SYSTEM_EN}
+_JUDGMENT_USER_PROMPTS = {"hi": _JUDGMENT_USER_HI, "en": _JUDGMENT_USER_EN}
+
+class LLMQueueFull(Exception):
+    """Raised when too many LLM calls are already waiting or in flight"""
+
+@dataclass(frozen=True)
+class LLMConfig:
+    """LLM settings resolved once from the environment"""
+    api_key: Optional[str]
+    base_url: str
+    model: str
+    max_concurrency: int
+    requests_per_minute: float
+    max_queue: int
+    max_retries: int
+    stream: bool
+    json_mode: bool
+    use_hybrid: bool
+    cache_enabled: bool
+    cache_size: int
+    cache_ttl: float
+    semantic_threshold: float
+    warmup_file: Optional[str]
+    cache_db: Optional[str]
+    batch_window_ms: float
+    batch_max_size: int
+    context_tokens: int
+
+    @classmethod
+    def from_env(cls) -> "LLMConfig":
+        return cls(
+            api_key=os.getenv("OPENAI_API_KEY"),
+            base_url=os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1"),
+            model=os.getenv("OPENAI_MODEL", "gpt-4o-mini"),
+            max_concurrency=int(os.getenv("OPENAI_MAX_CONCURRENCY", "8")),
+            requests_per_minute=float(os.getenv("OPENAI_REQUESTS_PER_MINUTE", "0")),
+            max_queue=int(os.getenv("OPENAI_MAX_QUEUE", "256")),
+            max_retries=int(os.getenv("OPENAI_MAX_RETRIES", "5")),
+            stream=os.getenv("OPENAI_STREAM", "false").lower() == "true",
+            json_mode=os.getenv("OPENAI_JSON_MODE", "true").lower() == "true",
+            use_hybrid=os.getenv("ENABLE_HYBRID_AI", "true").lower() == "true",
+            cache_enabled=os.getenv("ENABLE_CACHE", "true").lower() == "true",
+            cache_size=int(os.getenv("LLM_CACHE_SIZE", "1000")),
+            cache_ttl=float(os.getenv("CACHE_TTL", "3600")),
+            semantic_threshold=float(os.getenv("LLM_SEMANTIC_CACHE_THRESHOLD", "0.95")),
+            warmup_file=os.getenv("LLM_WARMUP_FILE") or None,
+            cache_db=os.getenv("LLM_CACHE_DB") or None,
+            batch_window_ms=float(os.getenv("LLM_BATCH_WINDOW_MS", "0")),
+            batch_max_size=int(os.getenv("LLM_BATCH_MAX_SIZE", "32")),
+            context_tokens=int(os.getenv("LLM_CONTEXT_TOKENS", "8000"))
+        )
+
+@functools.lru_cache(maxsize=1)
+def get_llm_config() -> LLMConfig:
+    """Load LLM config on first use (after the app has loaded .env)"""
+    return LLMConfig.from_env()
+
+def load_warmup_queries(path: str) -> List[Tuple[str, str]]:
+    """
+    Load warmup queries from a JSON list
+
+    Entries may be plain question strings or objects with "question" and
+    optional "language" keys.
+    """
+    with open(path, "rb") as f:
+        entries = fastjson.loads(f.read())
+    
+    queries = []
+    for entry in entries:
+        if isinstance(entry, str):
+            queries.append((entry, "auto"))
+        elif isinstance(entry, dict) and entry.get("question"):
+            queries.append((entry["question"], entry.get("language", "auto")))
+    return queries
+
 class LegalLLM:
     """Enhanced LLM interface with hybrid BERT+GPT capabilities"""
     
-    def __init__(self):
-        self.api_key = os.getenv("OPENAI_API_KEY")
-        self.base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
-        self.model = os.getenv("OPENAI_MODEL", "gpt-4o-mini")
+    def __init__(self, enable_dynamic_batch: Optional[bool] = None):
+        """
+        Args:
+            enable_dynamic_batch: Coalesce concurrent completions into
+                micro-batches. None follows LLM_BATCH_WINDOW_MS (> 0 enables)
+        """
+        self.config = get_llm_config()
+        self.api_key = self.config.api_key
+        self.base_url = self.config.base_url
+        self.model = self.config.model
         self.client = None
-        self.hybrid_ai: Optional[HybridLegalAI] = None
-        self.use_hybrid = os.getenv("ENABLE_HYBRID_AI", "true").lower() == "true"
+        self.hybrid_ai: Optional["HybridLegalAI"] = None
+        self.use_hybrid = self.config.use_hybrid
+        self._headers: Dict[str, str] = {}
+        self._llm_sem: Optional[asyncio.Semaphore] = None
+        self._bucket: Optional[AsyncTokenBucket] = None
+        self._queued = 0
+        self._token_usage = {"requests": 0, "prompt_tokens": 0, "completion_tokens": 0, "total_tokens": 0}
+        self._batcher: Optional[MicroBatcher] = None
+        if enable_dynamic_batch is None:
+            enable_dynamic_batch = self.config.batch_window_ms > 0
+        self.enable_dynamic_batch = enable_dynamic_batch
+        
+        # Result caches; a size of 0 disables caching
+        cache_size = self.config.cache_size if self.config.cache_enabled else 0
+        self._answer_cache = LRUCache(cache_size, self.config.cache_ttl)
+        self._summary_cache = LRUCache(cache_size, self.config.cache_ttl)
+        self._judgment_cache = LRUCache(cache_size, self.config.cache_ttl)
+        
+        # Near-duplicate questions over the same sources; needs a query embedder
+        self._semantic_cache = SemanticCache(
+            cache_size if self.config.semantic_threshold > 0 else 0,
+            self.config.cache_ttl,
+            self.config.semantic_threshold
+        )
+        self._embed_query: Optional[Callable[[str], Awaitable[Any]]] = None
+        self._context_cache = LRUCache(64)
+        
+        # Optional persistent tier behind the in-memory caches
+        self._disk_cache: Optional[SQLiteCache] = None
+        if self.config.cache_enabled and self.config.cache_db:
+            try:
+                self._disk_cache = SQLiteCache(self.config.cache_db, self.config.cache_ttl)
+            except Exception as e:
+                logger.warning("Persistent LLM cache unavailable: %s", e)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Get result cache and token usage statistics"""
+        return {
+            "answer_cache": self._answer_cache.stats(),
+            "summary_cache": self._summary_cache.stats(),
+            "judgment_cache": self._judgment_cache.stats(),
+            "semantic_cache": self._semantic_cache.stats(),
+            "context_cache": self._context_cache.stats(),
+            "token_usage": dict(self._token_usage)
+        }
+    
+    def set_query_embedder(self, embed_query: Callable[[str], Awaitable[Any]]):
+        """Enable semantic answer caching with an async text -> normalised vector function"""
+        self._embed_query = embed_query
+    
+    async def _question_embedding(self, question: str) -> Optional[Any]:
+        """Embed a question for the semantic cache; None if unavailable"""
+        if not self._embed_query or not self._semantic_cache.maxsize:
+            return None
+        try:
+            return await self._embed_query(question)
+        except Exception as e:
+            logger.warning("Question embedding failed, skipping semantic cache: %s", e)
+            return None
+    
+    async def _cache_get(self, cache: LRUCache, namespace: str, key: bytes) -> Optional[Any]:
+        """Look up memory then disk; returns a private copy or None"""
+        value = cache.get(key)
+        if value is None and self._disk_cache:
+            value = await self._disk_cache.aget(namespace, key)
+            if value is not None:
+                cache.put(key, value)
+        return copy.deepcopy(value) if value is not None else None
+    
+    async def _cache_answer(
+        self,
+        cache_key: bytes,
+        partition: bytes,
+        question_embedding: Optional[Any],
+        result: Dict[str, Any]
+    ):
+        """Store an answer in the exact and, when embedded, semantic caches"""
+        await self._cache_put(self._answer_cache, "answer", cache_key, result)
+        if question_embedding is not None:
+            self._semantic_cache.put(cache_key, partition, question_embedding, copy.deepcopy(result))
+    
+    async def _cache_put(self, cache: LRUCache, namespace: str, key: bytes, value: Any):
+        """Store a copy in memory and, if configured, on disk"""
+        cache.put(key, copy.deepcopy(value))
+        if self._disk_cache:
+            await self._disk_cache.aput(namespace, key, value)
+    
+    @staticmethod
+    def _sources_digest(sources: List[Dict[str, Any]], language: str) -> bytes:
+        """Digest of the retrieved chunk ids and language; partitions the semantic cache"""
+        h = hashlib.blake2b(str(language).encode("utf-8"), digest_size=16)
+        for source in sources:
+            h.update(b"\0")
+            h.update(str(source.get("chunk_id", "")).encode("utf-8"))
+        return h.digest()
+    
+    @staticmethod
+    def _judgment_cache_key(
+        case_facts: str,
+        legal_issues: List[str],
+        sources: List[Dict[str, Any]],
+        language: str
+    ) -> bytes:
+        """Cache key over case facts, the issue set, sources and language"""
+        h = hashlib.sha256(case_facts.encode("utf-8"))
+        for issue in sorted(legal_issues):
+            h.update(b"\0")
+            h.update(issue.encode("utf-8"))
+        h.update(b"\1")
+        h.update(LegalLLM._sources_digest(sources, language))
+        return h.digest()
+    
+    @staticmethod
+    def _answer_cache_key(question: str, sources: List[Dict[str, Any]], language: str) -> bytes:
+        """Cache key over question, language and the retrieved chunk ids"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(question.encode("utf-8"))
+        h.update(b"\0")
+        h.update(str(language).encode("utf-8"))
+        for source in sources:
+            h.update(b"\0")
+            h.update(str(source.get("chunk_id", "")).encode("utf-8"))
+        return h.digest()
+    
+    @staticmethod
+    def _summary_cache_key(content: str, language: str) -> bytes:
+        """Cache key over document content and language"""
+        h = hashlib.sha256(content.encode("utf-8"))
+        h.update(b"\0")
+        h.update(str(language).encode("utf-8"))
+        return h.digest()
     
     async def initialize(self):
         """Initialize LLM client and hybrid AI system"""
         if self.api_key:
-            self.client = httpx.AsyncClient(
-                timeout=httpx.Timeout(120.0),
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            )
+            self.client = get_client()
+            self._headers = {
+                "Authorization": f"Bearer {self.api_key}",
+                "Content-Type": "application/json"
+            }
+            
+            # Bound in-flight calls and optionally pace them to the account's RPM
+            self._llm_sem = asyncio.Semaphore(self.config.max_concurrency)
+            if self.config.requests_per_minute > 0:
+                self._bucket = AsyncTokenBucket(self.config.requests_per_minute / 60.0)
             logger.info("LLM client initialized")
+            
+            # Coalesce concurrent completions into micro-batches
+            if self.enable_dynamic_batch:
+                window_ms = self.config.batch_window_ms or _DEFAULT_BATCH_WINDOW_MS
+                self._batcher = MicroBatcher(
+                    self._post_chat_batch,
+                    max_batch_size=self.config.batch_max_size,
+                    max_wait=window_ms / 1000.0
+                )
+                self._batcher.start()
         else:
             logger.warning("OpenAI API key not provided - using hybrid fallback mode")
         
         # Initialize hybrid AI system
         if self.use_hybrid:
             try:
+                from hybrid_legal_ai import create_hybrid_legal_ai
+                
                 self.hybrid_ai = await create_hybrid_legal_ai()
                 logger.info("Hybrid BERT+GPT system initialized")
             except Exception as e:
-                logger.warning(f"Hybrid AI initialization failed, using basic mode: {e}")
+                logger.warning("Hybrid AI initialization failed, using basic mode: %s", e)
                 self.hybrid_ai = None
     
+    async def aclose(self):
+        """Release background resources; the shared HTTP client is closed by the app"""
+        if self._batcher:
+            await self._batcher.stop()
+            self._batcher = None
+        if self._disk_cache:
+            self._disk_cache.close()
+            self._disk_cache = None
+    
+    async def warmup(
+        self,
+        queries: List[Tuple[str, str]],
+        search: Optional[Callable[..., Awaitable[List[Dict[str, Any]]]]] = None,
+        concurrency: int = 4
+    ) -> int:
+        """
+        Pre-populate the answer cache for common questions
+        
+        Args:
+            queries: (question, language) pairs
+            search: Retriever search coroutine used to fetch sources the same
+                way the /ask endpoint does; without it answers are ungrounded
+            concurrency: Max warmup answers generated at once
+            
+        Returns:
+            Number of queries warmed successfully
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+        
+        async def warm(question: str, language: str) -> bool:
+            async with semaphore:
+                try:
+                    sources = await search(query=question) if search else []
+                    await self.generate_answer(question, sources, language)
+                    return True
+                except Exception as e:
+                    logger.warning("Warmup failed for query: %s", e)
+                    return False
+        
+        results = await asyncio.gather(*(warm(q, lang) for q, lang in queries))
+        warmed = sum(results)
+        logger.info("LLM warmup complete: %d/%d queries", warmed, len(queries))
+        return warmed
+    
     async def generate_answer(
         self, 
         question: str, 
         sources: List[Dict[str, Any]], 
-        language: str = "auto"
+        language: str = "auto",
+        question_embedding: Optional[Any] = None
     ) -> Dict[str, Any]:
-        """Generate grounded answer using hybrid BERT+GPT system"""
+        """
+        Generate grounded answer using hybrid BERT+GPT system
+        
+        Pass question_embedding when retrieval already embedded the question,
+        so the semantic cache lookup doesn't run InLegalBERT a second time.
+        """
+        cache_key = self._answer_cache_key(question, sources, language)
+        cached = await self._cache_get(self._answer_cache, "answer", cache_key)
+        if cached is not None:
+            return cached
+        
+        # Fall back to a near-duplicate question grounded in the same sources
+        partition = self._sources_digest(sources, language)
+        if question_embedding is None:
+            question_embedding = await self._question_embedding(question)
+        if question_embedding is not None:
+            cached = self._semantic_cache.get(partition, question_embedding)
+            if cached is not None:
+                return copy.deepcopy(cached)
+        
         try:
             # Use hybrid AI system if available
             if self.hybrid_ai:
@@ -66,10 +652,13 @@ class LegalLLM:
                     language=language
                 )
                 
-                # Format hybrid response
-                response_text = self._format_hybrid_response(hybrid_result, sources)
+                # Format hybrid response, off the event loop for large results
+                if len(hybrid_result.legal_reasoning) > _FORMAT_OFFLOAD_STEPS:
+                    response_text = await run_blocking(self._format_hybrid_response, hybrid_result, sources)
+                else:
+                    response_text = self._format_hybrid_response(hybrid_result, sources)
                 
-                return {
+                result = {
                     "text": response_text,
                     "language_detected": hybrid_result.contextual_understanding.get("language", "en"),
                     "hybrid_analysis": {
@@ -84,6 +673,8 @@ class LegalLLM:
                     },
                     "enhanced_citations": hybrid_result.citations
                 }
+                await self._cache_answer(cache_key, partition, question_embedding, result)
+                return result
             
             # Use smart fallback system for rate limit handling
             else:
@@ -102,16 +693,14 @@ class LegalLLM:
                 if fallback_response.get("tier") in ["premium", "standard", "free"]:
                     response_text = fallback_response["answer"]
                     if sources:
-                        response_text += "\n\n**Sources:**\n"
-                        for i, source in enumerate(sources[:3], 1):
-                            response_text += f"[{i}] {source.get('filename', 'Unknown')} (Score: {source.get('combined_score', 0):.2f})\n"
+                        response_text = response_text + self._format_sources_block(sources)
                 else:
                     # Local or fallback tier
                     response_text = fallback_response["answer"]
                     if fallback_response.get("tier") == "rate_limited_fallback":
                         response_text += f"\n\n**Note**: Using {fallback_response.get('tier', 'fallback')} mode due to API rate limits. Premium ChatGPT will be available again shortly."
                 
-                return {
+                result = {
                     "text": response_text,
                     "language_detected": self._detect_language(question, language),
                     "ai_tier_used": fallback_response.get("tier", "unknown"),
@@ -119,44 +708,90 @@ class LegalLLM:
                     "quality_level": fallback_response.get("quality_level", "basic"),
                     "rate_limit_info": tier_info.get("rate_limited_tiers", [])
                 }
+                
+                # Only cache real model answers, not rate-limit or local fallbacks
+                if fallback_response.get("tier") in ["premium", "standard", "free"]:
+                    await self._cache_answer(cache_key, partition, question_embedding, result)
+                
+                return result
             
         except Exception as e:
-            logger.error(f"Failed to generate answer: {e}")
+            logger.error("Failed to generate answer: %s", e)
             return {
                 "text": f"Error generating answer: {str(e)}",
                 "language_detected": "en"
             }
     
+    async def generate_answer_stream(
+        self,
+        question: str,
+        sources: List[Dict[str, Any]],
+        language: str = "auto",
+        question_embedding: Optional[Any] = None
+    ) -> AsyncIterator[str]:
+        """
+        Stream a grounded answer as text chunks
+        
+        Tokens are relayed as the model produces them when the OpenAI client is
+        configured. The hybrid system and the fallback tiers cannot stream, so
+        their complete answer is yielded as a single chunk.
+        """
+        if self.hybrid_ai or not self.client:
+            result = await self.generate_answer(question, sources, language, question_embedding)
+            yield result["text"]
+            return
+        
+        detected_lang = self._detect_language(question, language)
+        context = self._prepare_context(sources)
+        system, prompt = self._create_qa_prompt(question, context, detected_lang)
+        
+        async for delta in self._call_llm_stream(prompt, system=system):
+            yield delta
+        
+        if sources:
+            yield self._format_sources_block(sources)
+    
+    @staticmethod
+    def _format_sources_block(sources: List[Dict[str, Any]]) -> str:
+        """Sources footer listing the top 3 retrieved chunks"""
+        parts = ["\n\n**Sources:**\n"]
+        parts.extend(
+            f"[{i}] {source.get('filename', 'Unknown')} (Score: {source.get('combined_score', 0):.2f})\n"
+            for i, source in enumerate(sources[:3], 1)
+        )
+        return "".join(parts)
+    
     def _format_hybrid_response(self, hybrid_result: Any, sources: List[Dict[str, Any]]) -> str:
         """Format hybrid analysis result into readable response"""
         
-        response_parts = []
+        # Main generated response
+        response_parts = [hybrid_result.generated_response]
         
-        # Add main generated response
-        response_parts.append(hybrid_result.generated_response)
-        
-        # Add legal reasoning section
+        # Legal reasoning section
         if hybrid_result.legal_reasoning:
             response_parts.append("\n\n**Legal Analysis:**")
-            for i, reasoning in enumerate(hybrid_result.legal_reasoning, 1):
-                response_parts.append(f"{i}. {reasoning}")
+            response_parts.extend(
+                f"{i}. {reasoning}" for i, reasoning in enumerate(hybrid_result.legal_reasoning, 1)
+            )
         
-        # Add contextual insights
+        # Contextual insights
         context = hybrid_result.contextual_understanding
         if context.get("legal_concepts"):
-            response_parts.append(f"\n\n**Legal Concepts Identified:** {', '.join(context['legal_concepts'][:5])}")
+            response_parts.append("\n\n**Legal Concepts Identified:** " + ", ".join(context["legal_concepts"][:5]))
         
-        # Add confidence and hybrid scoring
-        response_parts.append(f"\n\n**Analysis Quality:**")
-        response_parts.append(f"- Contextual Understanding: {hybrid_result.confidence_score:.2f}")
-        response_parts.append(f"- Hybrid Model Score: {hybrid_result.hybrid_score:.2f}")
-        response_parts.append(f"- Legal Complexity: {context.get('complexity_score', 0):.2f}")
+        # Confidence and hybrid scoring
+        response_parts.append(_HYBRID_QUALITY_TEMPLATE.format(
+            confidence=hybrid_result.confidence_score,
+            hybrid=hybrid_result.hybrid_score,
+            complexity=context.get("complexity_score", 0)
+        ))
         
-        # Add enhanced citations
+        # Enhanced citations, top 3 sources
         if hybrid_result.citations:
-            response_parts.append(f"\n\n**Sources:**")
-            for citation in hybrid_result.citations[:3]:  # Top 3 sources
-                response_parts.append(f"[{citation['index']}] {citation['filename']} (Relevance: {citation['relevance_score']:.2f})")
+            response_parts.append("\n\n**Sources:**")
+            response_parts.extend(
+                _HYBRID_CITATION_TEMPLATE.format_map(citation) for citation in hybrid_result.citations[:3]
+            )
         
         return "\n".join(response_parts)
     
@@ -170,22 +805,35 @@ class LegalLLM:
             if not self.client:
                 return self._fallback_summary()
             
+            cache_key = self._summary_cache_key(content, language)
+            cached = await self._cache_get(self._summary_cache, "summary", cache_key)
+            if cached is not None:
+                return cached
+            
             detected_lang = self._detect_language(content, language)
-            prompt = self._create_summary_prompt(content, detected_lang)
+            system, prompt = self._create_summary_prompt(content, detected_lang)
             
-            response = await self._call_llm(prompt)
+            response = await self._call_llm(prompt, system=system, json_mode=True)
             
             # Parse structured response
             try:
-                summary_data = json.loads(response)
+                summary_data, valid = _validate_fields(
+                    await self._loads_json(response),
+                    _SUMMARY_SCHEMA,
+                    self._parse_summary_fallback(response, detected_lang)
+                )
                 summary_data["language_detected"] = detected_lang
+                if valid:
+                    await self._cache_put(self._summary_cache, "summary", cache_key, summary_data)
+                else:
+                    logger.warning("LLM summary did not match the expected schema")
                 return summary_data
-            except json.JSONDecodeError:
+            except fastjson.JSONDecodeError:
                 # Fallback to basic parsing
                 return self._parse_summary_fallback(response, detected_lang)
             
         except Exception as e:
-            logger.error(f"Failed to generate summary: {e}")
+            logger.error("Failed to generate summary: %s", e)
             return self._fallback_summary()
     
     async def generate_judgment(
@@ -196,6 +844,11 @@ class LegalLLM:
         language: str = "auto"
     ) -> Dict[str, Any]:
         """Generate structured legal judgment using hybrid system"""
+        cache_key = self._judgment_cache_key(case_facts, legal_issues, relevant_sources, language)
+        cached = await self._cache_get(self._judgment_cache, "judgment", cache_key)
+        if cached is not None:
+            return cached
+        
         try:
             # Use hybrid AI for enhanced judgment generation
             if self.hybrid_ai:
@@ -212,11 +865,31 @@ class LegalLLM:
                     language=language
                 )
                 
-                # Create enhanced judgment structure
-                judgment_data = self._create_enhanced_judgment_structure(
-                    hybrid_result, case_facts, legal_issues, relevant_sources
-                )
+                # Cover issues the first pass did not reach with one batched
+                # follow-up call rather than one call per issue
+                legal_reasoning = list(hybrid_result.legal_reasoning)
+                if len(legal_reasoning) < len(legal_issues):
+                    remaining = legal_issues[len(legal_reasoning):]
+                    followup = await self.hybrid_ai.analyze_and_generate(
+                        query=f"Case Facts: {case_facts}\n\nLegal Issues: {'; '.join(remaining)}",
+                        sources=relevant_sources,
+                        generation_type="judgment",
+                        language=language
+                    )
+                    legal_reasoning.extend(followup.legal_reasoning[:len(remaining)])
                 
+                # Create enhanced judgment structure, off the event loop for large results
+                if len(legal_reasoning) > _FORMAT_OFFLOAD_STEPS:
+                    judgment_data = await run_blocking(
+                        self._create_enhanced_judgment_structure,
+                        hybrid_result, case_facts, legal_issues, relevant_sources, legal_reasoning
+                    )
+                else:
+                    judgment_data = self._create_enhanced_judgment_structure(
+                        hybrid_result, case_facts, legal_issues, relevant_sources, legal_reasoning
+                    )
+                
+                await self._cache_put(self._judgment_cache, "judgment", cache_key, judgment_data)
                 return judgment_data
             
             # Fallback to basic LLM
@@ -225,23 +898,31 @@ class LegalLLM:
                 detected_lang = self._detect_language(case_facts, language)
                 context = self._prepare_context(relevant_sources)
                 
-                prompt = self._create_judgment_prompt(
+                system, prompt = self._create_judgment_prompt(
                     case_facts, legal_issues, context, detected_lang
                 )
                 
-                response = await self._call_llm(prompt, max_tokens=3000)
+                response = await self._call_llm(prompt, max_tokens=3000, system=system, json_mode=True)
                 
                 try:
-                    judgment_data = json.loads(response)
+                    judgment_data, valid = _validate_fields(
+                        await self._loads_json(response),
+                        _JUDGMENT_SCHEMA_FIELDS,
+                        self._parse_judgment_fallback(response)
+                    )
+                    if valid:
+                        await self._cache_put(self._judgment_cache, "judgment", cache_key, judgment_data)
+                    else:
+                        logger.warning("LLM judgment did not match the expected schema")
                     return judgment_data
-                except json.JSONDecodeError:
+                except fastjson.JSONDecodeError:
                     return self._parse_judgment_fallback(response)
             
             else:
                 return self._fallback_judgment()
             
         except Exception as e:
-            logger.error(f"Failed to generate judgment: {e}")
+            logger.error("Failed to generate judgment: %s", e)
             return self._fallback_judgment()
     
     def _create_enhanced_judgment_structure(
@@ -249,11 +930,19 @@ class LegalLLM:
         hybrid_result: Any,
         case_facts: str,
         legal_issues: List[str],
-        relevant_sources: List[Dict[str, Any]]
+        relevant_sources: List[Dict[str, Any]],
+        legal_reasoning: Optional[List[str]] = None
     ) -> Dict[str, Any]:
         """Create enhanced judgment structure using hybrid analysis"""
         
         context = hybrid_result.contextual_understanding
+        if legal_reasoning is None:
+            legal_reasoning = hybrid_result.legal_reasoning
+        
+        # One analysis entry per issue; never invent issues for surplus reasoning
+        issue_reasoning = zip_longest(
+            legal_issues, legal_reasoning[:len(legal_issues)], fillvalue="[pending analysis]"
+        )
         
         # Extract legal concepts and entities for judgment
         legal_concepts = context.get("legal_concepts", [])
@@ -289,7 +978,7 @@ class LegalLLM:
                     "analysis": f"Based on hybrid BERT+GPT analysis: {reasoning}",
                     "citations": [source.get("filename", "Unknown") for source in relevant_sources[:2]]
                 }
-                for issue, reasoning in zip(legal_issues, hybrid_result.legal_reasoning)
+                for issue, reasoning in issue_reasoning
             ],
             "findings": [
                 f"Hybrid contextual analysis confidence: {hybrid_result.confidence_score:.2f}",
@@ -331,140 +1020,108 @@ class LegalLLM:
     def _extract_applicable_law_from_concepts(self, legal_concepts: List[str], legal_entities: List[Dict[str, Any]]) -> Dict[str, List[str]]:
         """Extract applicable law based on identified concepts and entities"""
         
+        # Sets deduplicate as we go
         applicable_law = {
-            "constitutional": [],
-            "statutes": [],
-            "rules_regulations": [],
-            "precedents": []
+            "constitutional": set(),
+            "statutes": set(),
+            "rules_regulations": set(),
+            "precedents": set()
         }
         
         # Map concepts to law categories
         for concept in legal_concepts:
-            if "criminal_law" in concept:
-                applicable_law["statutes"].append("Indian Penal Code, 1860")
-                applicable_law["statutes"].append("Code of Criminal Procedure, 1973")
-            elif "constitutional_law" in concept:
-                applicable_law["constitutional"].append("Constitution of India")
-            elif "procedural_law" in concept:
-                applicable_law["statutes"].append("Code of Criminal Procedure, 1973")
-                applicable_law["statutes"].append("Indian Evidence Act, 1872")
-            elif "civil_law" in concept:
-                applicable_law["statutes"].append("Indian Contract Act, 1872")
-                applicable_law["statutes"].append("Transfer of Property Act, 1882")
+            for keyword, (category, laws) in _CONCEPT_MAP.items():
+                if keyword in concept:
+                    applicable_law[category].update(laws)
+                    break
         
         # Add from legal entities
+        statutes = applicable_law["statutes"]
         for entity in legal_entities:
             if entity.get("type") == "act_reference":
-                act_name = entity.get("value", "")
-                if act_name not in applicable_law["statutes"]:
-                    applicable_law["statutes"].append(act_name)
+                statutes.add(entity.get("value", ""))
         
-        # Remove duplicates
-        for category in applicable_law:
-            applicable_law[category] = list(set(applicable_law[category]))
-        
-        return applicable_law
+        # Sorted so identical inputs always produce identical output
+        return {category: sorted(laws) for category, laws in applicable_law.items()}
     
     def _determine_case_type(self, legal_concepts: List[str]) -> str:
         """Determine case type based on legal concepts"""
         
-        if any("criminal_law" in concept for concept in legal_concepts):
-            return "criminal"
-        elif any("constitutional_law" in concept for concept in legal_concepts):
-            return "constitutional"
-        elif any("civil_law" in concept for concept in legal_concepts):
-            return "civil"
-        else:
-            return "miscellaneous"
+        # Newline-joined so a keyword cannot match across two concepts
+        joined = "\n".join(legal_concepts)
+        for keyword, case_type in _CASE_TYPE_PRIORITY:
+            if keyword in joined:
+                return case_type
+        return "miscellaneous"
     
     def _detect_language(self, text: str, language: str) -> str:
         """Detect or validate language setting"""
         if language in ["en", "hi"]:
             return language
         
-        # Auto-detect based on script
-        if is_devanagari_text(text):
-            return "hi"
-        else:
-            return "en"
+        # Auto-detect based on script over a bounded sample
+        return _sample_language(text[:_LANG_SAMPLE_CHARS])
     
     def _prepare_context(self, sources: List[Dict[str, Any]]) -> str:
-        """Prepare context string from source chunks"""
+        """
+        Prepare context string from source chunks
+        
+        Sources are packed highest combined_score first until the
+        LLM_CONTEXT_TOKENS budget is spent, then rendered in their original
+        order so [n] markers still match the sources footer.
+        """
         if not sources:
             return ""
         
-        context_parts = []
-        for i, source in enumerate(sources, 1):
-            filename = source.get("filename", "Unknown")
-            text = source.get("text", "")
-            
-            context_parts.append(f"[{i}] {filename}: {text[:500]}...")
+        # Chunk ids are unique per ingestion and chunk text never changes,
+        # so the id sequence identifies the rendered context
+        chunk_ids = [source.get("chunk_id") for source in sources]
+        cache_key = None
+        if all(chunk_ids):
+            cache_key = hashlib.blake2b("|".join(chunk_ids).encode("utf-8"), digest_size=16).digest()
+            cached = self._context_cache.get(cache_key)
+            if cached is not None:
+                return cached
+        
+        entries = [
+            f"[{i}] {source.get('filename', 'Unknown')}: {source.get('text', '')[:500]}..."
+            for i, source in enumerate(sources, 1)
+        ]
+        
+        count_tokens = _token_counter(self.model)
+        ranked = sorted(
+            range(len(sources)),
+            key=lambda i: sources[i].get("combined_score", 0),
+            reverse=True
+        )
+        budget = self.config.context_tokens
+        selected = set()
+        for i in ranked:
+            cost = count_tokens(entries[i])
+            if cost > budget:
+                continue
+            budget -= cost
+            selected.add(i)
+        
+        if len(selected) < len(sources):
+            logger.info("Context token budget kept %d of %d sources", len(selected), len(sources))
         
-        return "\n\n".join(context_parts)
+        context = "\n\n".join(entry for i, entry in enumerate(entries) if i in selected)
+        if cache_key is not None:
+            self._context_cache.put(cache_key, context)
+        return context
     
-    def _create_qa_prompt(self, question: str, context: str, language: str) -> str:
-        """Create prompt for question answering"""
-        if language == "hi":
-            return f"""आप एक भारतीय कानूनी विशेषज्ञ हैं। दिए गए संदर्भ के आधार पर प्रश्न का उत्तर दें।
-
-संदर्भ:
-{context}
-
-प्रश्न: {question}
-
-निर्देश:
-- केवल दिए गए संदर्भ का उपयोग करें
-- उत्तर में [1], [2] आदि के रूप में उद्धरण शामिल करें
-- सटीक और संक्षिप्त उत्तर दें
-- यदि जानकारी उपलब्ध नहीं है तो स्पष्ट रूप से बताएं
-
-उत्तर:"""
-        else:
-            return f"""You are an Indian legal expert. Answer the question based on the provided context.
-
-Context:
-{context}
-
-Question: {question}
-
-Instructions:
-- Use only the provided context
-- Include citations as [1], [2], etc. in your answer
-- Provide accurate and concise responses
-- If information is not available, clearly state so
-
-Answer:"""
+    def _create_qa_prompt(self, question: str, context: str, language: str) -> Tuple[str, str]:
+        """Create (system, user) prompts for question answering"""
+        lang = "hi" if language == "hi" else "en"
+        system = _QA_SYSTEM_PROMPTS[lang]
+        template = _QA_USER_PROMPTS[lang]
+        return system, template.format_map({"context": context, "question": question})
     
-    def _create_summary_prompt(self, content: str, language: str) -> str:
-        """Create prompt for document summarization"""
-        if language == "hi":
-            prompt = f"""निम्नलिखित कानूनी दस्तावेज़ का संरचित सारांश बनाएं:
-
-{content[:2000]}
-
-कृपया निम्नलिखित JSON प्रारूप में उत्तर दें:
-{{
-    "facts": "मुख्य तथ्य",
-    "issues": ["कानूनी मुद्दे की सूची"],
-    "arguments": "पक्षों के तर्क",
-    "holding": "न्यायालय का निर्णय",
-    "relief": "राहत/आदेश"
-}}"""
-        else:
-            prompt = f"""Provide a structured summary of the following legal document:
-
-{content[:2000]}
-
-Please respond in the following JSON format:
-{{
-    "facts": "Key facts of the case",
-    "issues": ["List of legal issues"],
-    "arguments": "Arguments presented by parties",
-    "holding": "Court's decision/holding",
-    "relief": "Relief granted/orders issued"
-}}"""
-        
-        return prompt
+    def _create_summary_prompt(self, content: str, language: str) -> Tuple[str, str]:
+        """Create (system, user) prompts for document summarization"""
+        system = _SUMMARY_SYSTEM_PROMPTS["hi" if language == "hi" else "en"]
+        return system, content[:2000]
     
     def _create_judgment_prompt(
         self,
@@ -472,133 +1129,259 @@ Please respond in the following JSON format:
         legal_issues: List[str],
         context: str,
         language: str
-    ) -> str:
-        """Create prompt for judgment generation"""
-        issues_str = "\n".join(f"- {issue}" for issue in legal_issues)
-        
-        if language == "hi":
-            prompt = f"""आप एक भारतीय न्यायाधीश हैं। निम्नलिखित मामले के लिए संरचित निर्णय तैयार करें:
-
-मामले के तथ्य:
-{case_facts}
-
-कानूनी मुद्दे:
-{issues_str}
-
-संबंधित कानूनी संदर्भ:
-{context}
-
-कृपया निम्नलिखित JSON संरचना में निर्णय प्रदान करें:"""
-        else:
-            prompt = f"""You are an Indian judge. Draft a structured judgment for the following case:
-
-Case Facts:
-{case_facts}
-
-Legal Issues:
-{issues_str}
-
-Relevant Legal Context:
-{context}
-
-Please provide the judgment in the following JSON structure:"""
-        
-        # Add JSON schema
-        schema = """{
-    "metadata": {
-        "case_type": "civil/criminal/constitutional",
-        "jurisdiction": "Supreme Court/High Court/District Court",
-        "date": "YYYY-MM-DD"
-    },
-    "framing": "Brief framing of the case and jurisdiction",
-    "points_for_determination": ["List of legal points to be determined"],
-    "applicable_law": {
-        "constitutional": ["Relevant constitutional provisions"],
-        "statutes": ["Applicable statutes"],
-        "rules_regulations": ["Relevant rules and regulations"],
-        "precedents": ["Key precedent cases"]
-    },
-    "arguments": {
-        "petitioner": "Petitioner's main arguments",
-        "respondent": "Respondent's main arguments"
-    },
-    "court_analysis": [
-        {
-            "issue": "Legal issue being analyzed",
-            "analysis": "Court's reasoning",
-            "citations": ["Relevant case law and statutes"]
-        }
-    ],
-    "findings": ["Court's key findings"],
-    "relief": {
-        "final_order": "Final order of the court",
-        "directions": ["Specific directions issued"],
-        "costs": "Cost orders if any"
-    },
-    "prediction": {
-        "likely_outcome": "Most probable outcome",
-        "probabilities": {
-            "favor_petitioner": 0.0,
-            "favor_respondent": 0.0,
-            "partial_relief": 0.0
-        },
-        "drivers": ["Key factors influencing the outcome"]
-    },
-    "limitations": ["Limitations of this analysis"]
-}"""
-        
-        return prompt + "\n\n" + schema
+    ) -> Tuple[str, str]:
+        """Create (system, user) prompts for judgment generation"""
+        lang = "hi" if language == "hi" else "en"
+        system = _JUDGMENT_SYSTEM_PROMPTS[lang]
+        template = _JUDGMENT_USER_PROMPTS[lang]
+        return system, template.format_map({
+            "case_facts": case_facts,
+            "issues": "\n".join(f"- {issue}" for issue in legal_issues),
+            "context": context
+        })
     
-    async def _call_llm(self, prompt: str, max_tokens: int = 2000) -> str:
+    async def _call_llm(
+        self,
+        prompt: str,
+        max_tokens: int = 2000,
+        system: Optional[str] = None,
+        json_mode: bool = False
+    ) -> str:
         """Make API call to LLM with security measures"""
         try:
-            # Validate prompt length
-            if len(prompt) > 50000:
-                prompt = prompt[:50000] + "\n[Content truncated for safety]"
-            
-            payload = {
-                "model": self.model,
-                "messages": [
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": min(max_tokens, 4000),  # Cap max tokens
-                "temperature": 0.1
-            }
-            
-            # Make request with timeout
-            response = await self.client.post(
-                f"{self.base_url}/chat/completions",
-                json=payload,
-                timeout=120.0
+            payload = self._build_payload(
+                prompt, max_tokens, system=system, stream=self.config.stream, json_mode=json_mode
             )
             
-            if response.status_code == 401:
-                raise Exception("Invalid API key - please check your credentials")
-            elif response.status_code == 429:
-                raise Exception("Rate limit exceeded - please try again later")
-            elif response.status_code != 200:
-                # Don't log full response for security
-                raise Exception(f"LLM API error: {response.status_code}")
-            
-            result = response.json()
-            content = result["choices"][0]["message"]["content"]
-            
-            # Validate response content
-            if len(content) > 100000:  # Sanity check
-                logger.warning("Unusually long LLM response received")
-                content = content[:100000] + "\n[Response truncated for safety]"
-            
-            return content
+            if self._batcher:
+                return await self._batcher.submit(payload)
+            return await self._post_chat(payload)
             
         except Exception as e:
             # Log error without exposing sensitive information
-            error_msg = str(e)
-            if "sk-" in error_msg:
-                error_msg = re.sub(r'sk-[a-zA-Z0-9]+', 'sk-****', error_msg)
-            
-            logger.error(f"LLM API call failed: {error_msg}")
+            logger.error("LLM API call failed: %s", _redact_error(e))
+            raise
+    
+    async def _call_llm_stream(
+        self,
+        prompt: str,
+        max_tokens: int = 2000,
+        system: Optional[str] = None
+    ) -> AsyncIterator[str]:
+        """Stream completion text deltas as they arrive"""
+        payload = self._build_payload(prompt, max_tokens, system=system, stream=True)
+        size = 0
+        try:
+            async with self._chat_response(payload) as response:
+                async for delta in self._iter_deltas(response):
+                    yield delta
+                    size += len(delta)
+                    if size > 100000:  # Sanity check, as in _post_chat
+                        logger.warning("Unusually long LLM response received")
+                        yield "\n[Response truncated for safety]"
+                        break
+        except Exception as e:
+            logger.error("LLM streaming call failed: %s", _redact_error(e))
             raise
     
+    def _build_payload(
+        self,
+        prompt: str,
+        max_tokens: int,
+        system: Optional[str] = None,
+        stream: bool = False,
+        json_mode: bool = False
+    ) -> Dict[str, Any]:
+        """
+        Build a chat/completions payload with prompt and token caps applied
+        
+        json_mode asks the API for a syntactically valid JSON object (the
+        prompt must mention JSON); it is skipped when OPENAI_JSON_MODE=false
+        for endpoints that don't support response_format.
+        """
+        # Validate prompt length
+        if len(prompt) > 50000:
+            prompt = prompt[:50000] + "\n[Content truncated for safety]"
+        
+        # Static system prompt first so it forms a cacheable prefix
+        messages = [{"role": "system", "content": system}] if system else []
+        messages.append({"role": "user", "content": prompt})
+        
+        payload = {
+            "model": self.model,
+            "messages": messages,
+            "max_tokens": min(max_tokens, 4000),  # Cap max tokens
+            "temperature": 0.1
+        }
+        if json_mode and self.config.json_mode:
+            payload["response_format"] = {"type": "json_object"}
+        if stream:
+            payload["stream"] = True
+            # Ask for token usage in the final stream event
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    async def _send(self, payload: Dict[str, Any]) -> httpx.Response:
+        """POST to chat/completions, retrying once on a dropped connection"""
+        stream = bool(payload.get("stream"))
+        body = fastjson.dumps(payload)
+        for attempt in range(2):
+            request = self.client.build_request(
+                "POST",
+                f"{self.base_url}/chat/completions",
+                content=body,
+                headers=self._headers
+            )
+            try:
+                return await self.client.send(request, stream=stream)
+            except _TRANSIENT_HTTP_ERRORS as e:
+                if attempt:
+                    raise
+                logger.warning("LLM connection dropped (%s), retrying once", type(e).__name__)
+    
+    @staticmethod
+    def _retry_delay(response: Optional[httpx.Response], attempt: int) -> float:
+        """
+        Backoff before a retry
+        
+        Honours Retry-After when the response has one; otherwise full jitter
+        over an exponential cap, so synchronised clients spread out.
+        """
+        delay = None
+        headers = response.headers if response is not None else {}
+        retry_after_ms = headers.get("retry-after-ms")
+        retry_after = headers.get("retry-after")
+        try:
+            if retry_after_ms is not None:
+                delay = float(retry_after_ms) / 1000.0
+            elif retry_after is not None:
+                delay = float(retry_after)
+        except ValueError:
+            delay = None
+        
+        if delay is None:
+            return random.uniform(0, min(60.0, 2.0 ** (attempt + 1)))
+        
+        delay = min(delay, 60.0)
+        return delay + random.uniform(0, delay * 0.25)
+    
+    @contextlib.asynccontextmanager
+    async def _chat_response(self, payload: Dict[str, Any]) -> AsyncIterator[httpx.Response]:
+        """
+        Open a successful chat/completions response under the concurrency limits
+        
+        Applies queue backpressure, the concurrency semaphore, RPM pacing and
+        backoff on 429/5xx and timeouts. The slot is held until the caller
+        finishes reading.
+        """
+        # Backpressure: refuse new work once the wait queue is full
+        if self._queued >= self.config.max_queue:
+            raise LLMQueueFull(f"LLM request queue full ({self.config.max_queue} pending)")
+        
+        self._queued += 1
+        try:
+            async with self._llm_sem:
+                for attempt in range(self.config.max_retries + 1):
+                    if self._bucket:
+                        await self._bucket.acquire()
+                    
+                    last_attempt = attempt == self.config.max_retries
+                    try:
+                        response = await self._send(payload)
+                    except httpx.TimeoutException as e:
+                        if last_attempt:
+                            raise
+                        delay = self._retry_delay(None, attempt)
+                        logger.warning("LLM request timed out (%s), retrying in %.1fs (attempt %d/%d)",
+                                       type(e).__name__, delay, attempt + 1, self.config.max_retries)
+                        await asyncio.sleep(delay)
+                        continue
+                    
+                    if response.status_code not in _RETRYABLE_STATUS or last_attempt:
+                        break
+                    
+                    await response.aclose()
+                    delay = self._retry_delay(response, attempt)
+                    logger.warning("LLM returned %d, retrying in %.1fs (attempt %d/%d)",
+                                   response.status_code, delay, attempt + 1, self.config.max_retries)
+                    await asyncio.sleep(delay)
+                
+                try:
+                    if response.status_code == 401:
+                        raise Exception("Invalid API key - please check your credentials")
+                    elif response.status_code == 429:
+                        raise Exception("Rate limit exceeded - please try again later")
+                    elif response.status_code != 200:
+                        # Don't log full response for security
+                        raise Exception(f"LLM API error: {response.status_code}")
+                    
+                    yield response
+                finally:
+                    await response.aclose()
+        finally:
+            self._queued -= 1
+    
+    async def _post_chat(self, payload: Dict[str, Any]) -> str:
+        """POST a single chat/completions payload and return the message content"""
+        async with self._chat_response(payload) as response:
+            if payload.get("stream"):
+                content = await self._read_stream(response)
+            else:
+                result = fastjson.loads(response.content)
+                content = result["choices"][0]["message"]["content"]
+                if result.get("usage"):
+                    self._record_usage(result["usage"])
+        
+        # Validate response content
+        if len(content) > 100000:  # Sanity check
+            logger.warning("Unusually long LLM response received")
+            content = content[:100000] + "\n[Response truncated for safety]"
+        
+        return content
+    
+    async def _iter_deltas(self, response: httpx.Response) -> AsyncIterator[str]:
+        """Yield content deltas from a streamed completion, recording final usage"""
+        async for event in iter_sse_events(response):
+            # With include_usage the last event has usage and no choices
+            if event.get("usage"):
+                self._record_usage(event["usage"])
+            choices = event.get("choices") or []
+            if not choices:
+                continue
+            delta = choices[0].get("delta", {}).get("content")
+            if delta:
+                yield delta
+    
+    async def _read_stream(self, response: httpx.Response) -> str:
+        """Accumulate streamed content deltas, stopping early past the size cap"""
+        parts = []
+        size = 0
+        async for delta in self._iter_deltas(response):
+            parts.append(delta)
+            size += len(delta)
+            if size > 100000:
+                break
+        return "".join(parts)
+    
+    def _record_usage(self, usage: Dict[str, Any]):
+        """Accumulate token usage reported by the API"""
+        for field in ("prompt_tokens", "completion_tokens", "total_tokens"):
+            self._token_usage[field] += usage.get(field) or 0
+        self._token_usage["requests"] += 1
+    
+    async def _post_chat_batch(self, payloads: List[Dict[str, Any]]) -> List[Any]:
+        """Dispatch a micro-batch of payloads concurrently over the shared client"""
+        return await asyncio.gather(
+            *(self._post_chat(payload) for payload in payloads),
+            return_exceptions=True
+        )
+    
+    async def _loads_json(self, response: str) -> Any:
+        """Decode JSON from the LLM, off the event loop for large payloads"""
+        if len(response) > _JSON_OFFLOAD_THRESHOLD:
+            return await run_blocking(fastjson.loads, response)
+        return fastjson.loads(response)
+    
     def _fallback_summary(self) -> Dict[str, Any]:
         """Fallback summary when LLM is unavailable"""
         return {
@@ -0,0 +1,66 @@
+"""
+Shared HTTP client for outbound LLM API calls
+"""
+import logging
+import os
+from typing import Any, AsyncIterator, Optional
+
+import httpx
+
+from utils import fastjson
+
+logger = logging.getLogger(__name__)
+
+try:
+    import h2  # noqa: F401
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+_client: Optional[httpx.AsyncClient] = None
+
+def get_client() -> httpx.AsyncClient:
+    """
+    Return the process-wide pooled client, creating it on first use
+
+    Auth headers are not set on the client; callers pass them per request
+    so different API keys can share one connection pool. Pool limits are
+    read from the environment on first use, after .env has been loaded.
+    """
+    global _client
+    if _client is None or _client.is_closed:
+        max_connections = int(os.getenv("LLM_HTTP_MAX_CONNECTIONS", "1000"))
+        max_keepalive = int(os.getenv("LLM_HTTP_MAX_KEEPALIVE", "200"))
+        _client = httpx.AsyncClient(
+            limits=httpx.Limits(
+                max_connections=max_connections,
+                max_keepalive_connections=min(max_keepalive, max_connections),
+                keepalive_expiry=float(os.getenv("LLM_HTTP_KEEPALIVE_EXPIRY", "60"))
+            ),
+            timeout=httpx.Timeout(connect=5.0, read=120.0, write=60.0, pool=30.0),
+            http2=HTTP2_AVAILABLE
+        )
+        logger.info(
+            "Shared LLM HTTP client created (http2=%s, max_connections=%d, keepalive=%d)",
+            HTTP2_AVAILABLE, max_connections, max_keepalive
+        )
+    return _client
+
+async def close_client():
+    """Close the shared client; call from application shutdown"""
+    global _client
+    if _client is not None:
+        await _client.aclose()
+        _client = None
+        logger.info("Shared LLM HTTP client closed")
+
+async def iter_sse_events(response: httpx.Response) -> AsyncIterator[Any]:
+    """Yield decoded `data:` payloads from an OpenAI-style SSE stream until [DONE]"""
+    async for line in response.aiter_lines():
+        if not line.startswith("data:"):
+            continue
+        data = line[5:].strip()
+        if data == "[DONE]":
+            break
+        if data:
+            yield fastjson.loads(data)
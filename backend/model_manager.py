@@ -6,14 +6,46 @@ import os
 import json
 import logging
 import hashlib
+import shutil
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
 from typing import Dict, List, Optional
-import requests
-from transformers import AutoTokenizer, AutoModel
-import torch
 
 logger = logging.getLogger(__name__)
 
+# hf_transfer (optional) fetches each file over parallel ranged requests.
+# huggingface_hub reads this flag when it is first imported.
+try:
+    import hf_transfer  # noqa: F401
+    os.environ.setdefault("HF_HUB_ENABLE_HF_TRANSFER", "1")
+except ImportError:
+    pass
+
+# Files needed by AutoTokenizer / AutoModel; everything else in the repo
+# (TF/Flax/ONNX weights, READMEs) is skipped
+TOKENIZER_PATTERNS = ["*.json", "*.txt", "*.model"]
+MODEL_PATTERNS = ["config.json", "*.index.json"]
+DOWNLOAD_WORKERS = 8
+
+HASH_CHUNK_SIZE = 1 << 20
+
+# Packaged weight precisions and their size relative to the fp32 download
+PACKAGE_PRECISIONS = {"fp32": 1.0, "fp16": 0.5}
+
+def _link_or_copy(src: str, dst: str) -> str:
+    """
+    copytree copy_function: hardlink when source and target share a
+    filesystem, otherwise fall back to a normal copy (sendfile on Linux)
+    
+    Packaged files must therefore never be modified in place; replace them
+    instead so the linked originals stay intact.
+    """
+    try:
+        os.link(src, dst)
+        return dst
+    except OSError:
+        return shutil.copy2(src, dst)
+
 class ModelManager:
     """Manages AI model downloading and caching for offline use"""
     
@@ -56,25 +88,25 @@ class ModelManager:
             config = self.models_config[model_key]
             model_path = self.models_dir / model_key
             
-            # Check if already downloaded
-            if model_path.exists() and not force_download:
-                logger.info(f"Model {model_key} already cached")
-                return True
+            # model_info.json is written last, so an interrupted download is
+            # retried (and resumed) rather than treated as cached
+            if (model_path / "model_info.json").exists() and not force_download:
+                if self._verify_files(model_path):
+                    logger.info(f"Model {model_key} already cached")
+                    return True
+                logger.warning(f"Cached files for {model_key} failed verification, re-downloading")
             
             logger.info(f"Downloading {config['name']} (~{config['size_mb']}MB)...")
             
-            # Download using transformers
+            # Fetch the raw files; models are only instantiated at inference
+            # time by the offline loader
             if config["type"] == "transformers":
                 try:
-                    # Download tokenizer and model
-                    tokenizer = AutoTokenizer.from_pretrained(
+                    self._snapshot(config["name"], model_path / "tokenizer", TOKENIZER_PATTERNS)
+                    self._snapshot(
                         config["name"],
-                        cache_dir=str(model_path / "tokenizer")
-                    )
-                    
-                    model = AutoModel.from_pretrained(
-                        config["name"],
-                        cache_dir=str(model_path / "model")
+                        model_path / "model",
+                        MODEL_PATTERNS + self._weight_patterns(config["name"])
                     )
                     
                     # Save model info
@@ -83,7 +115,9 @@ class ModelManager:
                         "type": config["type"],
                         "downloaded": True,
                         "path": str(model_path),
-                        "size_mb": config["size_mb"]
+                        "size_mb": config["size_mb"],
+                        "file_hashes": self._hash_files(model_path),
+                        "file_stats": self._stat_files(model_path)
                     }
                     
                     with open(model_path / "model_info.json", "w") as f:
@@ -100,19 +134,116 @@ class ModelManager:
             logger.error(f"Model download failed: {e}")
             return False
     
+    def _snapshot(self, repo_id: str, local_dir: Path, allow_patterns: List[str]):
+        """Download matching repo files into local_dir, resuming partial files"""
+        from huggingface_hub import snapshot_download
+        
+        snapshot_download(
+            repo_id,
+            local_dir=str(local_dir),
+            local_dir_use_symlinks=False,
+            allow_patterns=allow_patterns,
+            max_workers=DOWNLOAD_WORKERS,
+            resume_download=True
+        )
+    
+    def _model_files(self, model_path: Path) -> List[Path]:
+        """Downloaded files under model_path, sorted"""
+        files = []
+        for file_path in sorted(model_path.rglob("*")):
+            relative = file_path.relative_to(model_path)
+            # Skip model_info.json itself and hub bookkeeping (.cache, .huggingface)
+            if not file_path.is_file() or relative.name == "model_info.json":
+                continue
+            if any(part.startswith(".") for part in relative.parts):
+                continue
+            files.append(file_path)
+        return files
+    
+    def _hash_files(self, model_path: Path) -> Dict[str, str]:
+        """SHA-256 of every downloaded file, keyed by path relative to model_path"""
+        hashes = {}
+        for file_path in self._model_files(model_path):
+            digest = hashlib.sha256()
+            with open(file_path, "rb") as f:
+                for chunk in iter(lambda: f.read(HASH_CHUNK_SIZE), b""):
+                    digest.update(chunk)
+            hashes[file_path.relative_to(model_path).as_posix()] = digest.hexdigest()
+        return hashes
+    
+    def _stat_files(self, model_path: Path) -> Dict[str, List[int]]:
+        """[size, mtime_ns] of every downloaded file, keyed like _hash_files"""
+        stats = {}
+        for file_path in self._model_files(model_path):
+            st = file_path.stat()
+            stats[file_path.relative_to(model_path).as_posix()] = [st.st_size, st.st_mtime_ns]
+        return stats
+    
+    def _verify_files(self, model_path: Path, full: bool = True) -> bool:
+        """
+        Check files against what model_info.json recorded
+        
+        full=True re-hashes every file against the recorded SHA-256s. The
+        quick check (full=False) only compares sizes and mtimes, which is
+        enough to notice a replaced, truncated or missing file without
+        reading the weights.
+        """
+        try:
+            with open(model_path / "model_info.json", "r") as f:
+                model_info = json.load(f)
+        except Exception:
+            return False
+        
+        expected_hashes = model_info.get("file_hashes")
+        # Caches written before hashes were recorded can't be checked
+        if expected_hashes is None:
+            return True
+        if full:
+            return self._hash_files(model_path) == expected_hashes
+        
+        expected_stats = model_info.get("file_stats")
+        if expected_stats is None:
+            # Older caches recorded hashes only: check the file set
+            return {
+                file_path.relative_to(model_path).as_posix() for file_path in self._model_files(model_path)
+            } == set(expected_hashes)
+        return self._stat_files(model_path) == expected_stats
+    
+    def _weight_patterns(self, repo_id: str) -> List[str]:
+        """Pick one weight format, preferring safetensors, so we don't fetch both"""
+        try:
+            from huggingface_hub import list_repo_files
+            
+            files = list_repo_files(repo_id)
+            if any(name.endswith(".safetensors") for name in files):
+                return ["*.safetensors"]
+            return ["pytorch_model*.bin"]
+        except Exception as e:
+            logger.warning(f"Could not list files for {repo_id}: {e}")
+            return ["*.safetensors", "pytorch_model*.bin"]
+    
     def download_all_models(self, include_optional: bool = True) -> Dict[str, bool]:
         """Download all required models"""
         results = {}
+        selected = []
         
         for model_key, config in self.models_config.items():
             if config["required"] or include_optional:
-                logger.info(f"Downloading {model_key}...")
-                results[model_key] = self.download_model(model_key)
+                selected.append(model_key)
             else:
                 logger.info(f"Skipping optional model: {model_key}")
                 results[model_key] = False
         
-        return results
+        # Downloads are network-bound and each model has its own cache_dir,
+        # so fetch them concurrently
+        if selected:
+            logger.info(f"Downloading {len(selected)} models in parallel: {', '.join(selected)}")
+            with ThreadPoolExecutor(max_workers=len(selected)) as executor:
+                for model_key, success in zip(selected, executor.map(self.download_model, selected)):
+                    results[model_key] = success
+        
+        # Keep results in config order
+        return {model_key: results[model_key] for model_key in self.models_config}
     
     def get_model_status(self) -> Dict[str, Dict]:
         """Get status of all models"""
@@ -123,8 +254,10 @@ class ModelManager:
             
             if model_path.exists() and (model_path / "model_info.json").exists():
                 try:
-                    with open(model_path / "model_info.json", "r") as f:
-                        model_info = json.load(f)
+                    # Status is polled, so only the cheap size/mtime check
+                    # here; download_model re-hashes before trusting a cache
+                    if not self._verify_files(model_path, full=False):
+                        raise ValueError("file size/mtime mismatch")
                     
                     status[model_key] = {
                         "downloaded": True,
@@ -159,8 +292,112 @@ class ModelManager:
         
         return total_size
     
-    def create_offline_package(self, output_dir: str) -> bool:
-        """Create offline model package for installer"""
+    def _to_safetensors(self, model_dir: Path):
+        """
+        Rewrite pytorch_model*.bin checkpoints in model_dir as safetensors
+        
+        transformers picks model*.safetensors over .bin when both could exist,
+        and safetensors files are memory-mapped on load instead of unpickled
+        into a full CPU copy, so startup peak RSS stays around one shard.
+        """
+        bin_files = sorted(model_dir.glob("pytorch_model*.bin"))
+        if not bin_files:
+            return
+        
+        import torch
+        from safetensors.torch import save_file
+        
+        for bin_file in bin_files:
+            st_file = model_dir / (bin_file.stem.replace("pytorch_model", "model", 1) + ".safetensors")
+            tmp_file = st_file.with_name(st_file.name + ".tmp")
+            
+            state_dict = torch.load(str(bin_file), map_location="cpu")
+            # safetensors refuses tensors sharing storage (tied embeddings);
+            # transformers re-ties them after loading
+            tensors = {
+                name: t.contiguous().clone()
+                for name, t in state_dict.items()
+                if torch.is_tensor(t)
+            }
+            save_file(tensors, str(tmp_file), metadata={"format": "pt"})
+            os.replace(tmp_file, st_file)
+            bin_file.unlink()
+            logger.info(f"Converted {bin_file.name} to {st_file.name}")
+        
+        index_file = model_dir / "pytorch_model.bin.index.json"
+        if index_file.exists():
+            with open(index_file, "r") as f:
+                index = json.load(f)
+            index["weight_map"] = {
+                name: shard.replace("pytorch_model", "model", 1)[:-len(".bin")] + ".safetensors"
+                for name, shard in index["weight_map"].items()
+            }
+            with open(model_dir / "model.safetensors.index.json", "w") as f:
+                json.dump(index, f, indent=2)
+            index_file.unlink()
+    
+    def _convert_weights(self, model_dir: Path, precision: str):
+        """
+        Cast floating-point weights in model_dir to the target precision
+        
+        Works on the checkpoint files directly, so it needs no model class.
+        Each file is rewritten via a temp file + os.replace, never in place.
+        """
+        if precision == "fp32":
+            return
+        
+        import torch
+        
+        dtype = torch.float16
+        for weights_file in sorted(model_dir.iterdir()):
+            tmp_file = weights_file.with_name(weights_file.name + ".tmp")
+            
+            if weights_file.suffix == ".safetensors":
+                from safetensors.torch import load_file, save_file
+                
+                tensors = load_file(str(weights_file))
+                tensors = {
+                    name: t.to(dtype) if t.is_floating_point() else t
+                    for name, t in tensors.items()
+                }
+                save_file(tensors, str(tmp_file), metadata={"format": "pt"})
+            elif weights_file.name.startswith("pytorch_model") and weights_file.suffix == ".bin":
+                state_dict = torch.load(str(weights_file), map_location="cpu")
+                state_dict = {
+                    name: t.to(dtype) if torch.is_tensor(t) and t.is_floating_point() else t
+                    for name, t in state_dict.items()
+                }
+                torch.save(state_dict, str(tmp_file))
+            else:
+                continue
+            
+            os.replace(tmp_file, weights_file)
+            logger.info(f"Converted {weights_file.name} to {precision}")
+    
+    def _update_model_info(self, model_path: Path, **fields):
+        """Merge fields into model_info.json, replacing the file atomically"""
+        info_file = model_path / "model_info.json"
+        with open(info_file, "r") as f:
+            model_info = json.load(f)
+        model_info.update(fields)
+        
+        tmp_file = info_file.with_name(info_file.name + ".tmp")
+        with open(tmp_file, "w") as f:
+            json.dump(model_info, f, indent=2)
+        os.replace(tmp_file, info_file)
+    
+    def create_offline_package(self, output_dir: str, precision: str = "fp16") -> bool:
+        """
+        Create offline model package for installer
+        
+        Weights are shipped as safetensors only and cast to `precision`
+        ("fp16" halves the bundle; "fp32" keeps the downloaded values).
+        The loaders upcast on load.
+        """
+        if precision not in PACKAGE_PRECISIONS:
+            logger.error(f"Unsupported package precision: {precision}")
+            return False
+        
         try:
             output_path = Path(output_dir)
             output_path.mkdir(exist_ok=True)
@@ -178,19 +415,32 @@ class ModelManager:
                 return False
             
             # Copy models to output directory
-            import shutil
             models_output = output_path / "models"
             if models_output.exists():
                 shutil.rmtree(models_output)
             
-            shutil.copytree(self.models_dir, models_output)
+            shutil.copytree(self.models_dir, models_output, copy_function=_link_or_copy)
+            
+            for model_key in self.models_config:
+                packaged_path = models_output / model_key
+                if results.get(model_key) and (packaged_path / "model").exists():
+                    self._to_safetensors(packaged_path / "model")
+                    self._convert_weights(packaged_path / "model", precision)
+                    self._update_model_info(
+                        packaged_path,
+                        precision=precision,
+                        file_hashes=self._hash_files(packaged_path),
+                        file_stats=self._stat_files(packaged_path)
+                    )
             
             # Create model manifest
+            size_factor = PACKAGE_PRECISIONS[precision]
             manifest = {
                 "version": "1.0.0",
                 "models": self.models_config,
                 "download_results": results,
-                "total_size_mb": sum(config["size_mb"] for config in self.models_config.values())
+                "precision": precision,
+                "total_size_mb": int(sum(config["size_mb"] for config in self.models_config.values()) * size_factor)
             }
             
             with open(output_path / "model_manifest.json", "w") as f:
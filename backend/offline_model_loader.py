@@ -3,31 +3,246 @@ Offline Model Loader for InLegalDesk
 Loads AI models from bundled installer package or downloads if needed
 """
 import os
-import json
 import logging
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Dict, Any, Optional, Tuple
+from typing import Dict, Any, List, Optional, Tuple
 import torch
 from transformers import AutoTokenizer, AutoModel, T5Tokenizer, T5ForConditionalGeneration
-from transformers import XLNetTokenizer, XLNetLMHeadModel
+from transformers import XLNetTokenizer, XLNetLMHeadModel, T5TokenizerFast, XLNetTokenizerFast
+from transformers import PreTrainedTokenizerFast
+
+from utils import fastjson
+from utils.aio import run_blocking
+from utils.batching import MicroBatcher
 
 logger = logging.getLogger(__name__)
 
+# With accelerate installed, from_pretrained can build the model on the meta
+# device and load weights straight into place instead of allocating twice
+try:
+    import accelerate  # noqa: F401
+    ACCELERATE_AVAILABLE = True
+except ImportError:
+    ACCELERATE_AVAILABLE = False
+
+# The Rust tokenizers backend builds a bundled tokenizer.json directly
+try:
+    from tokenizers import Tokenizer
+    TOKENIZERS_AVAILABLE = True
+except ImportError:
+    TOKENIZERS_AVAILABLE = False
+
+_PRECISION_DTYPES = {
+    "fp32": torch.float32,
+    "fp16": torch.float16,
+    "bf16": torch.bfloat16
+}
+
+def _resolve_precision() -> str:
+    """
+    Effective INLEGAL_PRECISION: fp32, fp16, bf16 or int8
+    
+    The default "auto" uses fp16 on CUDA and keeps fp32 on CPU, where half
+    precision is slow or unsupported. int8 is dynamic quantisation, which
+    only runs on CPU, so CUDA hosts get fp16 instead.
+    """
+    precision = os.getenv("INLEGAL_PRECISION", "auto").lower()
+    if precision == "int8" and torch.cuda.is_available():
+        return "fp16"
+    if precision != "int8" and precision not in _PRECISION_DTYPES:
+        return "fp16" if torch.cuda.is_available() else "fp32"
+    return precision
+
+def _model_load_kwargs() -> Dict[str, Any]:
+    """Extra from_pretrained arguments for model weights"""
+    precision = _resolve_precision()
+    # int8 models are loaded in fp32 and quantised afterwards
+    dtype = torch.float32 if precision == "int8" else _PRECISION_DTYPES[precision]
+    
+    kwargs = {"torch_dtype": dtype}
+    if ACCELERATE_AVAILABLE:
+        kwargs["low_cpu_mem_usage"] = True
+    return kwargs
+
+# Remembers where the bundle was found so later starts probe one path
+_BUNDLE_PATH_FILE = Path(".inlegalbert_bundle_path")
+
+# Tokenizers already loaded in this process, keyed by (class, name or path)
+_TOKENIZER_CACHE: Dict[Tuple[str, str], Any] = {}
+
+def _load_tokenizer(tokenizer_cls, name_or_path: str, fallback_cls=None, **kwargs) -> Any:
+    """
+    Load a tokenizer once per process, preferring the Rust-backed fast class
+    
+    fallback_cls (the slow sentencepiece class) is used if the fast
+    tokenizer can't be built, e.g. no tokenizer.json and no converter deps.
+    """
+    key = (tokenizer_cls.__name__, name_or_path)
+    tokenizer = _TOKENIZER_CACHE.get(key)
+    if tokenizer is not None:
+        return tokenizer
+    
+    try:
+        tokenizer = tokenizer_cls.from_pretrained(name_or_path, **kwargs)
+    except Exception as e:
+        if fallback_cls is None:
+            raise
+        logger.warning(f"Fast tokenizer unavailable for {name_or_path} ({e}), using slow tokenizer")
+        tokenizer = fallback_cls.from_pretrained(name_or_path, **kwargs)
+    
+    _TOKENIZER_CACHE[key] = tokenizer
+    return tokenizer
+
+# tokenizer_config.json entries that describe files or classes, not init args
+_TOKENIZER_CONFIG_SKIP = {"tokenizer_class", "auto_map", "name_or_path", "special_tokens_map_file", "tokenizer_file", "vocab_file", "added_tokens_decoder"}
+
+def _plain_token(token: Any) -> Any:
+    """Serialized AddedToken dicts -> their content string"""
+    if isinstance(token, dict):
+        return token.get("content")
+    if isinstance(token, list):
+        return [_plain_token(t) for t in token]
+    return token
+
+def _tokenizer_init_kwargs(tokenizer_dir: Path) -> Dict[str, Any]:
+    """Special tokens and settings from tokenizer_config.json + special_tokens_map.json"""
+    kwargs: Dict[str, Any] = {}
+    for name in ("tokenizer_config.json", "special_tokens_map.json"):
+        config_file = tokenizer_dir / name
+        if config_file.is_file():
+            with open(config_file, "rb") as f:
+                kwargs.update(fastjson.loads(f.read()))
+    return {
+        key: _plain_token(value)
+        for key, value in kwargs.items()
+        if key not in _TOKENIZER_CONFIG_SKIP
+    }
+
+def _load_bundled_tokenizer(tokenizer_dir: Path, fast_cls, fallback_cls=None, **kwargs) -> Any:
+    """
+    Build a bundled tokenizer straight from its tokenizer.json
+    
+    Skips from_pretrained's resolution pass (Auto* class lookup, vocab and
+    converter fallbacks). fast_cls is instantiated around the Rust
+    Tokenizer so model-specific defaults such as XLNet's left padding stay.
+    Falls back to _load_tokenizer when tokenizer.json is missing or fails.
+    """
+    tokenizer_file = tokenizer_dir / "tokenizer.json"
+    key = (fast_cls.__name__, str(tokenizer_file))
+    tokenizer = _TOKENIZER_CACHE.get(key)
+    if tokenizer is not None:
+        return tokenizer
+    
+    if TOKENIZERS_AVAILABLE and tokenizer_file.is_file():
+        try:
+            tokenizer = fast_cls(
+                tokenizer_object=Tokenizer.from_file(str(tokenizer_file)),
+                name_or_path=str(tokenizer_dir),
+                **_tokenizer_init_kwargs(tokenizer_dir)
+            )
+            _TOKENIZER_CACHE[key] = tokenizer
+            return tokenizer
+        except Exception as e:
+            logger.warning(f"Could not build tokenizer from {tokenizer_file} ({e}), using from_pretrained")
+    
+    auto_cls = AutoTokenizer if fast_cls is PreTrainedTokenizerFast else fast_cls
+    return _load_tokenizer(auto_cls, str(tokenizer_dir), fallback_cls, **kwargs)
+
+@functools.lru_cache(maxsize=4)
+def _load_manifest(path: str, mtime: float) -> Dict[str, Any]:
+    """Parse a model manifest; mtime is part of the key so edits are picked up"""
+    with open(path, "rb") as f:
+        return fastjson.loads(f.read())
+
+class BatchedModel:
+    """
+    Coalesce concurrent single-text encoder forwards into one padded batch
+    
+    `await batched(text)` returns (hidden_states, attention_mask) for that
+    text alone, shaped [1, seq_len, hidden] and [1, seq_len], as an unbatched
+    forward would. Batches run one at a time in the default executor.
+    """
+    
+    def __init__(self, tokenizer: Any, model: Any, max_batch: int = 32, max_wait_ms: float = 5, max_length: int = 512):
+        self.tokenizer = tokenizer
+        self.model = model
+        self.max_length = max_length
+        self._batcher = MicroBatcher(self._run_batch, max_batch_size=max_batch, max_wait=max_wait_ms / 1000.0)
+    
+    async def __call__(self, text: str) -> Tuple[torch.Tensor, torch.Tensor]:
+        return await self._batcher.submit(text)
+    
+    async def close(self):
+        """Flush queued texts and stop the batching task"""
+        await self._batcher.stop()
+    
+    async def _run_batch(self, texts: List[str]) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        return await run_blocking(self._forward_sync, texts)
+    
+    def _forward_sync(self, texts: List[str]) -> List[Tuple[torch.Tensor, torch.Tensor]]:
+        # Follow the model wherever the caller moved it
+        device = next(self.model.parameters()).device
+        inputs = self.tokenizer(
+            texts,
+            return_tensors="pt",
+            padding=True,
+            truncation=True,
+            max_length=self.max_length
+        )
+        inputs = {k: v.to(device) for k, v in inputs.items()}
+        
+        with torch.no_grad():
+            hidden_states = self.model(**inputs).last_hidden_state
+        
+        # Drop each row's padding (either side) so results match solo forwards
+        mask = inputs["attention_mask"].bool()
+        return [
+            (hidden_states[i][mask[i]].unsqueeze(0), inputs["attention_mask"][i][mask[i]].unsqueeze(0))
+            for i in range(len(texts))
+        ]
+
 class OfflineModelLoader:
     """Loads AI models from bundled package or downloads as fallback"""
     
+    # get_model() key -> load method
+    _LOADER_METHODS = {
+        "inlegalbert": "load_inlegalbert",
+        "t5": "load_t5_model",
+        "xlnet": "load_xlnet_model"
+    }
+    # Encoder models served through BatchedModel
+    _BATCHED_KEYS = ("inlegalbert",)
+    
     def __init__(self):
         # Check for bundled models (from installer)
         self.bundled_models_dir = self._find_bundled_models()
         self.cache_dir = Path("models_cache")
         self.cache_dir.mkdir(exist_ok=True)
         
-        # Model loading status
+        # Model loading status; loaders may run in parallel threads
         self.loaded_models = {}
         self.loading_progress = {}
+        self._lock = threading.Lock()
+        # One lock per model so different models can still load in parallel
+        self._model_locks = {key: threading.Lock() for key in self._LOADER_METHODS}
+        # Micro-batching facades over encoder models, see get_batched_model()
+        self.batched_models: Dict[str, BatchedModel] = {}
     
     def _find_bundled_models(self) -> Optional[Path]:
         """Find bundled models directory from installer"""
+        # Path recorded on a previous start, if it still holds a bundle
+        try:
+            cached_path = Path(_BUNDLE_PATH_FILE.read_text(encoding="utf-8").strip())
+            if (cached_path / "model_manifest.json").is_file():
+                logger.info(f"Found bundled models at: {cached_path}")
+                return cached_path
+        except OSError:
+            pass
+        
+        # Most likely locations first
         possible_paths = [
             Path("models"),  # Bundled with installer
             Path("../models"),  # Relative to backend
@@ -36,8 +251,13 @@ class OfflineModelLoader:
         ]
         
         for path in possible_paths:
-            if path.exists() and (path / "model_manifest.json").exists():
+            # is_file() is one stat and implies the directory exists
+            if (path / "model_manifest.json").is_file():
                 logger.info(f"Found bundled models at: {path}")
+                try:
+                    _BUNDLE_PATH_FILE.write_text(str(path), encoding="utf-8")
+                except OSError:
+                    pass
                 return path
         
         logger.info("No bundled models found - will download as needed")
@@ -54,8 +274,8 @@ class OfflineModelLoader:
                 if bundled_path.exists():
                     logger.info("Loading InLegalBERT from bundled package...")
                     try:
-                        tokenizer = AutoTokenizer.from_pretrained(str(bundled_path / "tokenizer"))
-                        model = AutoModel.from_pretrained(str(bundled_path / "model"))
+                        tokenizer = _load_bundled_tokenizer(bundled_path / "tokenizer", PreTrainedTokenizerFast, use_fast=True)
+                        model = AutoModel.from_pretrained(str(bundled_path / "model"), **_model_load_kwargs())
                         logger.info("✅ InLegalBERT loaded from bundled package")
                         return tokenizer, model
                     except Exception as e:
@@ -63,13 +283,16 @@ class OfflineModelLoader:
             
             # Fallback to download
             logger.info("Downloading InLegalBERT from Hugging Face...")
-            tokenizer = AutoTokenizer.from_pretrained(
+            tokenizer = _load_tokenizer(
+                AutoTokenizer,
                 model_name,
+                use_fast=True,
                 cache_dir=str(self.cache_dir / "inlegalbert")
             )
             model = AutoModel.from_pretrained(
                 model_name,
-                cache_dir=str(self.cache_dir / "inlegalbert")
+                cache_dir=str(self.cache_dir / "inlegalbert"),
+                **_model_load_kwargs()
             )
             
             logger.info("✅ InLegalBERT downloaded and loaded")
@@ -90,8 +313,10 @@ class OfflineModelLoader:
                 if bundled_path.exists():
                     logger.info("Loading T5 from bundled package...")
                     try:
-                        tokenizer = T5Tokenizer.from_pretrained(str(bundled_path / "tokenizer"))
-                        model = T5ForConditionalGeneration.from_pretrained(str(bundled_path / "model"))
+                        tokenizer = _load_bundled_tokenizer(bundled_path / "tokenizer", T5TokenizerFast, T5Tokenizer)
+                        model = T5ForConditionalGeneration.from_pretrained(
+                            str(bundled_path / "model"), **_model_load_kwargs()
+                        )
                         logger.info("✅ T5 loaded from bundled package")
                         return tokenizer, model
                     except Exception as e:
@@ -99,13 +324,16 @@ class OfflineModelLoader:
             
             # Fallback to download
             logger.info("Downloading T5 model...")
-            tokenizer = T5Tokenizer.from_pretrained(
+            tokenizer = _load_tokenizer(
+                T5TokenizerFast,
                 model_name,
+                T5Tokenizer,
                 cache_dir=str(self.cache_dir / "t5")
             )
             model = T5ForConditionalGeneration.from_pretrained(
                 model_name,
-                cache_dir=str(self.cache_dir / "t5")
+                cache_dir=str(self.cache_dir / "t5"),
+                **_model_load_kwargs()
             )
             
             logger.info("✅ T5 downloaded and loaded")
@@ -126,8 +354,10 @@ class OfflineModelLoader:
                 if bundled_path.exists():
                     logger.info("Loading XLNet from bundled package...")
                     try:
-                        tokenizer = XLNetTokenizer.from_pretrained(str(bundled_path / "tokenizer"))
-                        model = XLNetLMHeadModel.from_pretrained(str(bundled_path / "model"))
+                        tokenizer = _load_bundled_tokenizer(bundled_path / "tokenizer", XLNetTokenizerFast, XLNetTokenizer)
+                        model = XLNetLMHeadModel.from_pretrained(
+                            str(bundled_path / "model"), **_model_load_kwargs()
+                        )
                         logger.info("✅ XLNet loaded from bundled package")
                         return tokenizer, model
                     except Exception as e:
@@ -135,13 +365,16 @@ class OfflineModelLoader:
             
             # Fallback to download
             logger.info("Downloading XLNet model...")
-            tokenizer = XLNetTokenizer.from_pretrained(
+            tokenizer = _load_tokenizer(
+                XLNetTokenizerFast,
                 model_name,
+                XLNetTokenizer,
                 cache_dir=str(self.cache_dir / "xlnet")
             )
             model = XLNetLMHeadModel.from_pretrained(
                 model_name,
-                cache_dir=str(self.cache_dir / "xlnet")
+                cache_dir=str(self.cache_dir / "xlnet"),
+                **_model_load_kwargs()
             )
             
             logger.info("✅ XLNet downloaded and loaded")
@@ -153,16 +386,21 @@ class OfflineModelLoader:
     
     def get_bundled_model_info(self) -> Dict[str, Any]:
         """Get information about bundled models"""
-        if not self.bundled_models_dir or not (self.bundled_models_dir / "model_manifest.json").exists():
+        if not self.bundled_models_dir:
+            return {"bundled": False, "models": {}}
+        
+        manifest_path = self.bundled_models_dir / "model_manifest.json"
+        try:
+            mtime = os.stat(manifest_path).st_mtime
+        except FileNotFoundError:
             return {"bundled": False, "models": {}}
         
         try:
-            with open(self.bundled_models_dir / "model_manifest.json", "r") as f:
-                manifest = json.load(f)
+            manifest = _load_manifest(str(manifest_path), mtime)
             
             return {
                 "bundled": True,
-                "models": manifest.get("models", {}),
+                "models": dict(manifest.get("models", {})),
                 "total_size_mb": manifest.get("total_size_mb", 0),
                 "version": manifest.get("version", "unknown")
             }
@@ -171,41 +409,88 @@ class OfflineModelLoader:
             logger.error(f"Failed to read model manifest: {e}")
             return {"bundled": False, "error": str(e)}
     
-    def initialize_all_models(self) -> Dict[str, bool]:
-        """Initialize all available models"""
-        results = {}
+    def _load_and_register(self, key: str, loader) -> bool:
+        """Run a load_* method and record the result in loaded_models"""
+        tokenizer, model = loader()
+        if tokenizer is None or model is None:
+            return False
         
+        precision = _resolve_precision()
+        if precision == "int8":
+            # int8 weights for every nn.Linear; activations stay fp32
+            model = torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+            logger.info(f"Quantized {key} to int8")
+        
+        with self._lock:
+            self.loaded_models[key] = {"tokenizer": tokenizer, "model": model, "precision": precision}
+        return True
+    
+    def get_model(self, key: str) -> Tuple[Optional[Any], Optional[Any]]:
+        """
+        Return (tokenizer, model) for "inlegalbert", "t5" or "xlnet"
+        
+        Models are loaded on first request and then reused, so a process
+        that only needs InLegalBERT never materialises T5 or XLNet. Returns
+        (None, None) if the model is unavailable; a later call retries.
+        """
+        entry = self.loaded_models.get(key)
+        if entry is None:
+            with self._model_locks[key]:
+                entry = self.loaded_models.get(key)
+                if entry is None:
+                    self._load_and_register(key, getattr(self, self._LOADER_METHODS[key]))
+                    entry = self.loaded_models.get(key)
+        
+        if entry is None:
+            return None, None
+        return entry["tokenizer"], entry["model"]
+    
+    def get_batched_model(self, key: str) -> Optional[BatchedModel]:
+        """
+        Return the micro-batching facade for an encoder model, or None
+        
+        Only InLegalBERT is wrapped: T5 and XLNet are used for generate(),
+        which doesn't fit a single coalesced forward pass.
+        """
+        if key in self.batched_models:
+            return self.batched_models[key]
+        if key not in self._BATCHED_KEYS:
+            return None
+        
+        tokenizer, model = self.get_model(key)
+        if model is None:
+            return None
+        
+        with self._lock:
+            if key not in self.batched_models:
+                self.batched_models[key] = BatchedModel(tokenizer, model)
+            return self.batched_models[key]
+    
+    def initialize_all_models(self) -> Dict[str, bool]:
+        """Eagerly load all models; normally they load on demand via get_model()"""
         print("🤖 Initializing AI Models...")
         
-        # Load InLegalBERT (required)
-        print("📋 Loading InLegalBERT...")
-        tokenizer, model = self.load_inlegalbert()
-        results["inlegalbert"] = (tokenizer is not None and model is not None)
+        # Loading is dominated by disk reads and tensor copies in C code, so
+        # the three models load concurrently in threads
+        print("📋 Loading InLegalBERT, T5 and XLNet...")
+        with ThreadPoolExecutor(max_workers=len(self._LOADER_METHODS)) as executor:
+            futures = {
+                key: executor.submit(self.get_model, key)
+                for key in self._LOADER_METHODS
+            }
+        results = {key: future.result()[1] is not None for key, future in futures.items()}
         
         if results["inlegalbert"]:
-            self.loaded_models["inlegalbert"] = {"tokenizer": tokenizer, "model": model}
             print("✅ InLegalBERT ready")
         else:
             print("❌ InLegalBERT failed - core functionality limited")
         
-        # Load T5 (optional)
-        print("📋 Loading T5...")
-        tokenizer, model = self.load_t5_model()
-        results["t5"] = (tokenizer is not None and model is not None)
-        
         if results["t5"]:
-            self.loaded_models["t5"] = {"tokenizer": tokenizer, "model": model}
             print("✅ T5 ready")
         else:
             print("⚠️  T5 unavailable - structured generation limited")
         
-        # Load XLNet (optional)
-        print("📋 Loading XLNet...")
-        tokenizer, model = self.load_xlnet_model()
-        results["xlnet"] = (tokenizer is not None and model is not None)
-        
         if results["xlnet"]:
-            self.loaded_models["xlnet"] = {"tokenizer": tokenizer, "model": model}
             print("✅ XLNet ready")
         else:
             print("⚠️  XLNet unavailable - hybrid processing limited")
@@ -221,7 +506,25 @@ class OfflineModelLoader:
         else:
             print("⚠️  Limited functionality - InLegalBERT required")
         
+        for key in self._BATCHED_KEYS:
+            self.get_batched_model(key)
+        
         return results
 
-# Global instance
-model_loader = OfflineModelLoader()
\ No newline at end of file
+_model_loader: Optional[OfflineModelLoader] = None
+_model_loader_lock = threading.Lock()
+
+def get_model_loader() -> OfflineModelLoader:
+    """Shared loader, created on first use rather than at import"""
+    global _model_loader
+    if _model_loader is None:
+        with _model_loader_lock:
+            if _model_loader is None:
+                _model_loader = OfflineModelLoader()
+    return _model_loader
+
+def __getattr__(name: str) -> Any:
+    # Keeps `from offline_model_loader import model_loader` working lazily
+    if name == "model_loader":
+        return get_model_loader()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
\ No newline at end of file
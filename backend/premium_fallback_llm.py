@@ -3,20 +3,148 @@ Premium Fallback LLM System
 Automatically switches from premium ChatGPT to free models when rate limited
 """
 import os
+import re
+import copy
 import json
+import random
+import hashlib
 import logging
 import asyncio
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, AsyncIterator
 import httpx
 from datetime import datetime, timedelta
 
+from llm_http import get_client, iter_sse_events
+from rate_limit_handler import rate_limit_handler
+from utils import fastjson
+from utils.cache import LRUCache
+
 logger = logging.getLogger(__name__)
 
+# Error/fallback answer templates, filled with str.format at response time
+_RATE_LIMIT_TEMPLATE = """🚨 **All ChatGPT Models Temporarily Rate Limited**
+
+Your question: "{question}"
+
+**What happened:**
+• Your premium ChatGPT subscription hit rate limits
+• All fallback models also rate limited
+• This is temporary and will reset automatically
+
+**Immediate Solutions:**
+1. ⏰ **Wait 1 hour** - Rate limits reset automatically
+2. 💰 **Add more credits** - https://platform.openai.com/account/billing
+3. 🔧 **Use offline mode** - Local AI models (no API limits)
+
+**Offline Mode Available:**
+I can switch to local legal AI models that don't use OpenAI API.
+This provides basic legal research without any rate limits.
+
+**Your Options:**
+• Wait for rate limits to reset
+• Use offline mode for immediate response
+• Add billing to increase limits
+
+Would you like me to switch to offline mode for unlimited usage?"""
+
+_ERROR_TEMPLATE = """❌ **API Error**
+
+Your question: "{question}"
+
+**Error:** {error}
+
+**Solutions:**
+1. Check your internet connection
+2. Verify OpenAI API key is valid
+3. Try again in a few minutes
+4. Use offline mode as backup
+
+**Offline Mode:**
+Switch to local AI models for immediate response without API dependency."""
+
+_BASIC_FALLBACK_TEMPLATE = """**Basic Legal Information**
+
+Your question: "{question}"
+
+**Available in Basic Mode:**
+• IPC sections and criminal law basics
+• Bail and procedure information
+• Constitutional law fundamentals
+• Evidence Act provisions
+
+**For Comprehensive Analysis:**
+• Ensure ChatGPT API is working
+• Use offline mode with local models
+• Upload relevant legal documents
+
+**Current Status:** Running in basic fallback mode due to API limitations."""
+
+# Canned answers for the basic fallback, keyed by precompiled topic patterns
+_MURDER_ANSWER = """**Section 302 - Murder (IPC)**
+
+Whoever commits murder shall be punished with death, or imprisonment for life, and shall also be liable to fine.
+
+**Key Elements:**
+• Intention to cause death
+• Knowledge that act is likely to cause death  
+• Actual causing of death
+
+**Punishment:** Death penalty OR Life imprisonment + Fine
+
+**Note:** This is a basic response. For comprehensive analysis, ensure API connectivity or use offline mode."""
+
+_BAIL_ANSWER = """**Bail Provisions (CrPC)**
+
+"Bail is the rule, jail is the exception"
+
+**Types of Bail:**
+• Regular bail (Sections 437-439)
+• Anticipatory bail (Section 438)
+• Interim bail (temporary)
+
+**Factors for Bail:**
+• Nature of offense
+• Severity of punishment
+• Character of accused
+• Flight risk
+
+**Note:** For detailed bail analysis, use full AI mode when available."""
+
+# Decorrelated jitter bounds for the retry loop, in seconds
+_RETRY_BASE_DELAY = 1.0
+_RETRY_MAX_DELAY = 30.0
+
+_FALLBACK_TOPICS = [
+    (re.compile(r"section 302|murder", re.IGNORECASE), _MURDER_ANSWER),
+    (re.compile(r"bail", re.IGNORECASE), _BAIL_ANSWER),
+]
+
 class PremiumFallbackLLM:
     """LLM with premium to free model fallback system"""
     
+    # Byte-identical on every call so provider prefix caching can reuse it;
+    # sources and the question follow in later messages
+    _SYSTEM_PROMPT = """You are an expert Indian legal research assistant. Answer the legal question based on the provided sources and your knowledge of Indian law.
+
+Please provide a comprehensive answer covering:
+1. Relevant legal provisions
+2. Case law if applicable
+3. Practical implications
+4. Citations to sources"""
+    
+    # Fields shared by every request; max_tokens is added per instance and
+    # model and messages are filled per call
+    _PAYLOAD_TEMPLATE = {
+        "temperature": 0.3
+    }
+    
     def __init__(self):
         self.api_key = os.getenv("OPENAI_API_KEY")
+        # Read here rather than at import so values from .env are picked up
+        self._payload_template = {
+            **self._PAYLOAD_TEMPLATE,
+            "max_tokens": int(os.getenv("OPENAI_MAX_TOKENS", "2000"))
+        }
         self.base_url = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
         
         # Model hierarchy: Premium → Standard → Free
@@ -49,13 +177,23 @@ class PremiumFallbackLLM:
         
         self.current_model_index = 0
         self.rate_limit_tracker = {}
-        self.client = None
+        self._headers = {
+            "Authorization": f"Bearer {self.api_key}",
+            "Content-Type": "application/json"
+        } if self.api_key else {}
+        
+        # Successful answers for repeated questions over the same sources
+        self._resp_cache = LRUCache(512, 3600)
+    
+    @property
+    def client(self) -> Optional[httpx.AsyncClient]:
+        """
+        Shared pooled client (HTTP/2 when available); None without an API key
         
-        if self.api_key:
-            self.client = httpx.AsyncClient(
-                timeout=httpx.Timeout(120.0),
-                headers={"Authorization": f"Bearer {self.api_key}"}
-            )
+        The client is owned by the app, which closes it at shutdown via
+        llm_http.close_client(); instances never close it themselves.
+        """
+        return get_client() if self.api_key else None
     
     def get_current_model(self) -> Dict[str, Any]:
         """Get current model information"""
@@ -79,22 +217,45 @@ class PremiumFallbackLLM:
         self.current_model_index = 0
         logger.info("Reset to premium model")
     
+    @staticmethod
+    def _cache_key(question: str, sources: List[Dict], language: str) -> bytes:
+        """Key over question, language and the (up to 3) sources sent in the prompt"""
+        h = hashlib.blake2b(digest_size=16)
+        h.update(question.encode("utf-8"))
+        h.update(b"\0")
+        h.update(str(language).encode("utf-8"))
+        for source in sources[:3]:
+            h.update(b"\0")
+            # Chunk ids identify immutable chunk text; hash the text itself without one
+            h.update(str(source.get("chunk_id") or source.get("text", "")).encode("utf-8"))
+        return h.digest()
+    
     async def generate_answer(self, question: str, sources: List[Dict] = None, language: str = "auto", max_retries: int = 3) -> Dict[str, Any]:
         """Generate answer with premium fallback system"""
         
         sources = sources or []
         
+        cache_key = self._cache_key(question, sources, language)
+        cached = self._resp_cache.get(cache_key)
+        if cached is not None:
+            return copy.deepcopy(cached)
+        
+        # Identical for every attempt and model, so built once per question
+        messages = self._build_messages(question, self._prepare_sources(sources), language)
+        
+        delay = _RETRY_BASE_DELAY
         for attempt in range(max_retries):
             try:
                 current_model = self.get_current_model()
                 
                 # Try current model
-                result = await self._call_openai_api(question, sources, language, current_model)
+                result = await self._call_openai_api(messages, language, current_model)
                 
                 if result["success"]:
                     # Add model info to response
                     result["model_used"] = current_model["description"]
                     result["tier"] = current_model["tier"]
+                    self._resp_cache.put(cache_key, copy.deepcopy(result))
                     return result
                 
                 # Handle rate limit
@@ -113,7 +274,8 @@ class PremiumFallbackLLM:
                 # Handle other errors
                 else:
                     if attempt < max_retries - 1:
-                        await asyncio.sleep(2 ** attempt)  # Exponential backoff
+                        delay = self._next_delay(delay)
+                        await asyncio.sleep(delay)
                         continue
                     else:
                         return await self._create_error_response(question, result["error"])
@@ -121,14 +283,108 @@ class PremiumFallbackLLM:
             except Exception as e:
                 logger.error(f"Attempt {attempt + 1} failed: {e}")
                 if attempt < max_retries - 1:
-                    await asyncio.sleep(2 ** attempt)
+                    delay = self._next_delay(delay)
+                    await asyncio.sleep(delay)
                 else:
                     return await self._create_error_response(question, str(e))
         
         # If all attempts failed
         return await self._create_fallback_response(question)
     
-    async def _call_openai_api(self, question: str, sources: List[Dict], language: str, model_info: Dict) -> Dict[str, Any]:
+    @staticmethod
+    def _next_delay(prev: float) -> float:
+        """
+        Decorrelated jitter backoff
+        
+        Unlike a fixed 2**attempt schedule, concurrent callers that failed
+        together spread out instead of retrying in lockstep.
+        """
+        return min(_RETRY_MAX_DELAY, random.uniform(_RETRY_BASE_DELAY, prev * 3))
+    
+    async def generate_answer_stream(self, question: str, sources: List[Dict] = None, language: str = "auto") -> AsyncIterator[str]:
+        """
+        Stream the answer from the current model as text deltas
+        
+        Cuts time-to-first-token for UI callers. If the streamed request
+        can't be started (no key, rate limit, API error) the buffered
+        generate_answer path runs instead, with its fallbacks, and its text
+        is yielded as one chunk. A transport error after the first delta is
+        re-raised instead: the partial text has already been sent.
+        """
+        sources = sources or []
+        started = False
+        
+        if self.client:
+            current_model = self.get_current_model()
+            messages = self._build_messages(question, self._prepare_sources(sources), language)
+            payload = self._build_payload(messages, current_model, stream=True)
+            try:
+                async with rate_limit_handler.slot(), self.client.stream(
+                    "POST",
+                    f"{self.base_url}/chat/completions",
+                    content=fastjson.dumps(payload),
+                    headers=self._headers,
+                    timeout=120.0
+                ) as response:
+                    if response.status_code == 200:
+                        async for event in iter_sse_events(response):
+                            # With include_usage the last event has usage and no choices
+                            if event.get("usage"):
+                                self._log_cache_usage(event["usage"])
+                            choices = event.get("choices") or []
+                            delta = choices[0].get("delta", {}).get("content") if choices else None
+                            if delta:
+                                started = True
+                                yield delta
+                        return
+                    
+                    logger.warning(f"Streaming request failed with status {response.status_code}")
+            except httpx.HTTPError as e:
+                if started:
+                    # Falling back now would append a second, complete answer
+                    # to the partial one the caller already has
+                    logger.error(f"Streaming answer interrupted: {e}")
+                    raise
+                if isinstance(e, httpx.TimeoutException):
+                    logger.warning("Streaming request timed out")
+                else:
+                    logger.warning(f"Streaming request failed: {e}")
+        
+        result = await self.generate_answer(question, sources, language)
+        yield result["text"]
+    
+    @staticmethod
+    def _prepare_sources(sources: List[Dict]) -> List[str]:
+        """Numbered, truncated previews of the (up to 3) sources sent in the prompt"""
+        return [
+            f"{i}. {source.get('text', '')[:500]}...\n"
+            for i, source in enumerate(sources[:3], 1)
+        ]
+    
+    def _build_messages(self, question: str, prepared_sources: List[str], language: str) -> List[Dict[str, str]]:
+        """Static system prompt first, then sources, then the question"""
+        messages = [{"role": "system", "content": self._SYSTEM_PROMPT}]
+        
+        if prepared_sources:
+            context = "Relevant legal sources:\n" + "".join(prepared_sources)
+            messages.append({"role": "user", "content": context})
+        
+        messages.append({
+            "role": "user",
+            "content": f"Question: {question}\n\nAnswer in {language if language != 'auto' else 'English'}:"
+        })
+        return messages
+    
+    def _build_payload(self, messages: List[Dict[str, str]], model_info: Dict, stream: bool = False) -> Dict[str, Any]:
+        """chat/completions payload for one model"""
+        payload = {**self._payload_template, "model": model_info["name"], "messages": messages}
+        if stream:
+            payload["stream"] = True
+            # Ask for token usage in the final stream event
+            payload["stream_options"] = {"include_usage": True}
+        return payload
+    
+    async def _call_openai_api(self, messages: List[Dict[str, str]], language: str, model_info: Dict) -> Dict[str, Any]:
         """Make API call to OpenAI with specific model"""
         
         if not self.client:
@@ -139,49 +395,23 @@ class PremiumFallbackLLM:
             }
         
         try:
-            # Create context from sources
-            context = ""
-            if sources:
-                context = "\n\nRelevant legal sources:\n"
-                for i, source in enumerate(sources[:3], 1):
-                    context += f"{i}. {source.get('text', '')[:500]}...\n"
+            payload = self._build_payload(messages, model_info)
             
-            # Create prompt
-            prompt = f"""You are an expert Indian legal research assistant. Answer the legal question based on the provided sources and your knowledge of Indian law.
-
-Question: {question}
-
-Context: {context}
-
-Please provide a comprehensive answer covering:
-1. Relevant legal provisions
-2. Case law if applicable  
-3. Practical implications
-4. Citations to sources
-
-Answer in {language if language != 'auto' else 'English'}:"""
-            
-            # API payload
-            payload = {
-                "model": model_info["name"],
-                "messages": [
-                    {"role": "system", "content": "You are an expert Indian legal research assistant."},
-                    {"role": "user", "content": prompt}
-                ],
-                "max_tokens": int(os.getenv("OPENAI_MAX_TOKENS", "2000")),
-                "temperature": 0.3
-            }
-            
-            # Make API call
-            response = await self.client.post(
+            # Read the body once as bytes and decode with fastjson, instead of
+            # letting httpx decode to str and re-parse with stdlib json
+            async with rate_limit_handler.slot(), self.client.stream(
+                "POST",
                 f"{self.base_url}/chat/completions",
-                json=payload,
+                content=fastjson.dumps(payload),
+                headers=self._headers,
                 timeout=120.0
-            )
+            ) as response:
+                content = await response.aread()
             
             if response.status_code == 200:
-                data = response.json()
+                data = fastjson.loads(content)
                 answer_text = data["choices"][0]["message"]["content"]
+                self._log_cache_usage(data.get("usage") or {})
                 
                 return {
                     "success": True,
@@ -201,7 +431,7 @@ Answer in {language if language != 'auto' else 'English'}:"""
                 }
             
             else:
-                error_data = response.json() if response.headers.get("content-type", "").startswith("application/json") else {"error": response.text}
+                error_data = fastjson.loads(content) if response.headers.get("content-type", "").startswith("application/json") else {"error": response.text}
                 return {
                     "success": False,
                     "error_type": "api_error",
@@ -222,33 +452,19 @@ Answer in {language if language != 'auto' else 'English'}:"""
                 "error": str(e)
             }
     
+    @staticmethod
+    def _log_cache_usage(usage: Dict[str, Any]):
+        """Log how many prompt tokens the provider served from its prefix cache"""
+        # OpenAI reports prompt_tokens_details.cached_tokens, DeepSeek prompt_cache_hit_tokens
+        details = usage.get("prompt_tokens_details") or {}
+        cached = details.get("cached_tokens", usage.get("prompt_cache_hit_tokens"))
+        if cached is not None:
+            logger.debug("Prompt cache: %s of %s prompt tokens cached", cached, usage.get("prompt_tokens"))
+    
     async def _create_rate_limit_response(self, question: str) -> Dict[str, Any]:
         """Create response when all models are rate limited"""
         return {
-            "text": f"""🚨 **All ChatGPT Models Temporarily Rate Limited**
-
-Your question: "{question}"
-
-**What happened:**
-• Your premium ChatGPT subscription hit rate limits
-• All fallback models also rate limited
-• This is temporary and will reset automatically
-
-**Immediate Solutions:**
-1. ⏰ **Wait 1 hour** - Rate limits reset automatically
-2. 💰 **Add more credits** - https://platform.openai.com/account/billing
-3. 🔧 **Use offline mode** - Local AI models (no API limits)
-
-**Offline Mode Available:**
-I can switch to local legal AI models that don't use OpenAI API.
-This provides basic legal research without any rate limits.
-
-**Your Options:**
-• Wait for rate limits to reset
-• Use offline mode for immediate response
-• Add billing to increase limits
-
-Would you like me to switch to offline mode for unlimited usage?""",
+            "text": _RATE_LIMIT_TEMPLATE.format(question=question),
             "language_detected": "en",
             "model_used": "Rate Limited",
             "tier": "fallback"
@@ -257,20 +473,7 @@ Would you like me to switch to offline mode for unlimited usage?""",
     async def _create_error_response(self, question: str, error: str) -> Dict[str, Any]:
         """Create response for API errors"""
         return {
-            "text": f"""❌ **API Error**
-
-Your question: "{question}"
-
-**Error:** {error}
-
-**Solutions:**
-1. Check your internet connection
-2. Verify OpenAI API key is valid
-3. Try again in a few minutes
-4. Use offline mode as backup
-
-**Offline Mode:**
-Switch to local AI models for immediate response without API dependency.""",
+            "text": _ERROR_TEMPLATE.format(question=question, error=error),
             "language_detected": "en",
             "model_used": "Error",
             "tier": "error"
@@ -279,58 +482,13 @@ Switch to local AI models for immediate response without API dependency.""",
     async def _create_fallback_response(self, question: str) -> Dict[str, Any]:
         """Create basic fallback response"""
         
-        # Basic legal knowledge responses
-        question_lower = question.lower()
-        
-        if "section 302" in question_lower or "murder" in question_lower:
-            answer = """**Section 302 - Murder (IPC)**
-
-Whoever commits murder shall be punished with death, or imprisonment for life, and shall also be liable to fine.
-
-**Key Elements:**
-• Intention to cause death
-• Knowledge that act is likely to cause death  
-• Actual causing of death
-
-**Punishment:** Death penalty OR Life imprisonment + Fine
-
-**Note:** This is a basic response. For comprehensive analysis, ensure API connectivity or use offline mode."""
-
-        elif "bail" in question_lower:
-            answer = """**Bail Provisions (CrPC)**
-
-"Bail is the rule, jail is the exception"
-
-**Types of Bail:**
-• Regular bail (Sections 437-439)
-• Anticipatory bail (Section 438)
-• Interim bail (temporary)
-
-**Factors for Bail:**
-• Nature of offense
-• Severity of punishment
-• Character of accused
-• Flight risk
-
-**Note:** For detailed bail analysis, use full AI mode when available."""
-
+        # First matching topic wins, in table order
+        for pattern, topic_answer in _FALLBACK_TOPICS:
+            if pattern.search(question):
+                answer = topic_answer
+                break
         else:
-            answer = f"""**Basic Legal Information**
-
-Your question: "{question}"
-
-**Available in Basic Mode:**
-• IPC sections and criminal law basics
-• Bail and procedure information
-• Constitutional law fundamentals
-• Evidence Act provisions
-
-**For Comprehensive Analysis:**
-• Ensure ChatGPT API is working
-• Use offline mode with local models
-• Upload relevant legal documents
-
-**Current Status:** Running in basic fallback mode due to API limitations."""
+            answer = _BASIC_FALLBACK_TEMPLATE.format(question=question)
 
         return {
             "text": answer,
@@ -5,19 +5,66 @@ Handles rate limiting gracefully with fallbacks and retries
 import asyncio
 import logging
 import time
-from typing import Optional, Dict, Any
+import contextlib
+from collections import deque
+from typing import Optional, Dict, Any, AsyncIterator
 import os
 from datetime import datetime, timedelta
 
 logger = logging.getLogger(__name__)
 
+# User-facing messages, filled with str.format when a limit is hit
+_RATE_LIMIT_MESSAGE_TEMPLATE = """
+🚨 **OpenAI Rate Limit Exceeded**
+
+Your ChatGPT API key is valid, but you've reached OpenAI's usage limits.
+
+**Wait Time**: {wait_time}
+
+**What this means**:
+• Your API key is working correctly
+• You've used up your allowed requests for this time period
+• This is normal with free/low-tier OpenAI accounts
+
+**Immediate Solutions**:
+1. ⏰ Wait {wait_time} and try again
+2. 💰 Add credits to your OpenAI account
+3. 🔧 Use local models as fallback (see below)
+4. 📊 Check usage at: https://platform.openai.com/usage
+"""
+
+_FALLBACK_MESSAGE_TEMPLATE = """
+🤖 **Local AI Response** (OpenAI Rate Limited)
+
+I'm currently rate-limited by OpenAI, but I can still help with basic legal information.
+
+**Your Question**: {question}
+
+**Basic Legal Guidance**:
+For comprehensive analysis of your legal question, please:
+
+1. ⏰ **Wait and retry** - OpenAI rate limit will reset automatically
+2. 💰 **Add credits** - Visit https://platform.openai.com/account/billing
+3. 🔧 **Use offline mode** - Set VLM_PRESET=offline for local-only processing
+4. 📚 **Manual research** - Check legal databases and statutes directly
+
+**Rate Limit Information**:
+• Your API key is valid and working
+• You've temporarily exceeded usage limits
+• This is normal with free/trial accounts
+• Adding billing removes most limitations
+
+**Alternative**: Use the offline mode which provides legal research without API calls.
+"""
+
 class OpenAIRateLimitHandler:
     """Handles OpenAI rate limiting with intelligent fallbacks"""
     
     def __init__(self):
         self.last_request_time = 0
         self.request_count = 0
-        self.rate_limit_reset_time = None
+        self.rate_limit_reset_time = None  # wall clock, for logs only
+        self._reset_monotonic = 0.0
         self.consecutive_failures = 0
         
         # Configuration
@@ -26,8 +73,57 @@ class OpenAIRateLimitHandler:
         self.retry_delay = int(os.getenv("RETRY_DELAY", "60"))
         self.enable_fallback = os.getenv("ENABLE_LOCAL_FALLBACK", "true").lower() == "true"
         
-    async def handle_rate_limit_error(self, error_response: Dict[str, Any]) -> Dict[str, Any]:
-        """Handle rate limit error with intelligent responses"""
+        # time.monotonic() of requests in the last 60s, oldest first
+        self._req_times = deque(maxlen=max(self.max_requests_per_minute, 0))
+        # Created on first use so it binds to the running event loop
+        self._sema: Optional[asyncio.Semaphore] = None
+    
+    async def acquire(self):
+        """
+        Wait until a request fits the per-minute budget, then record it
+        
+        Sliding 60s window over a deque of monotonic timestamps. The
+        prune/check/append sequence never awaits, so concurrent callers on
+        one event loop cannot overbook the window.
+        """
+        if self.max_requests_per_minute <= 0:
+            return
+        
+        while True:
+            now = time.monotonic()
+            while self._req_times and now - self._req_times[0] >= 60:
+                self._req_times.popleft()
+            
+            if len(self._req_times) < self.max_requests_per_minute:
+                self._req_times.append(now)
+                self.last_request_time = now
+                self.request_count += 1
+                return
+            
+            await asyncio.sleep(60 - (now - self._req_times[0]))
+    
+    @contextlib.asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one in-flight request slot under the shared per-minute budget
+        
+        Every OpenAI caller in the process goes through the module-level
+        handler, so they draw on one budget instead of each pacing alone.
+        A limit <= 0 disables pacing and the slot cap with it.
+        """
+        if self.max_requests_per_minute <= 0:
+            yield
+            return
+        
+        if self._sema is None:
+            self._sema = asyncio.Semaphore(self.max_requests_per_minute)
+        
+        async with self._sema:
+            await self.acquire()
+            yield
+    
+    def handle_rate_limit_error(self, error_response: Dict[str, Any]) -> Dict[str, Any]:
+        """Handle rate limit error with intelligent responses (no I/O, so synchronous)"""
         
         logger.warning("OpenAI rate limit exceeded")
         self.consecutive_failures += 1
@@ -36,7 +132,8 @@ class OpenAIRateLimitHandler:
         retry_after = error_response.get("retry_after", 60)
         error_type = error_response.get("error", {}).get("type", "rate_limit_exceeded")
         
-        # Calculate when to retry
+        # Calculate when to retry; the monotonic deadline drives the checks
+        self._reset_monotonic = time.monotonic() + retry_after
         self.rate_limit_reset_time = datetime.now() + timedelta(seconds=retry_after)
         
         logger.info(f"Rate limit reset time: {self.rate_limit_reset_time}")
@@ -62,24 +159,7 @@ class OpenAIRateLimitHandler:
         else:
             wait_time = f"{retry_after // 3600} hours"
         
-        message = f"""
-🚨 **OpenAI Rate Limit Exceeded**
-
-Your ChatGPT API key is valid, but you've reached OpenAI's usage limits.
-
-**Wait Time**: {wait_time}
-
-**What this means**:
-• Your API key is working correctly
-• You've used up your allowed requests for this time period
-• This is normal with free/low-tier OpenAI accounts
-
-**Immediate Solutions**:
-1. ⏰ Wait {wait_time} and try again
-2. 💰 Add credits to your OpenAI account
-3. 🔧 Use local models as fallback (see below)
-4. 📊 Check usage at: https://platform.openai.com/usage
-"""
+        message = _RATE_LIMIT_MESSAGE_TEMPLATE.format(wait_time=wait_time)
         
         return message
     
@@ -96,18 +176,11 @@ Your ChatGPT API key is valid, but you've reached OpenAI's usage limits.
     
     def should_retry(self) -> bool:
         """Check if we should retry the request"""
-        if self.rate_limit_reset_time is None:
-            return True
-        
-        return datetime.now() >= self.rate_limit_reset_time
+        return time.monotonic() >= self._reset_monotonic
     
     def get_wait_time(self) -> int:
         """Get remaining wait time in seconds"""
-        if self.rate_limit_reset_time is None:
-            return 0
-        
-        remaining = (self.rate_limit_reset_time - datetime.now()).total_seconds()
-        return max(0, int(remaining))
+        return max(0, int(self._reset_monotonic - time.monotonic()))
     
     async def wait_for_rate_limit_reset(self):
         """Wait for rate limit to reset"""
@@ -119,29 +192,7 @@ Your ChatGPT API key is valid, but you've reached OpenAI's usage limits.
     def create_fallback_response(self, question: str) -> Dict[str, Any]:
         """Create fallback response when rate limited"""
         
-        fallback_message = f"""
-🤖 **Local AI Response** (OpenAI Rate Limited)
-
-I'm currently rate-limited by OpenAI, but I can still help with basic legal information.
-
-**Your Question**: {question}
-
-**Basic Legal Guidance**:
-For comprehensive analysis of your legal question, please:
-
-1. ⏰ **Wait and retry** - OpenAI rate limit will reset automatically
-2. 💰 **Add credits** - Visit https://platform.openai.com/account/billing
-3. 🔧 **Use offline mode** - Set VLM_PRESET=offline for local-only processing
-4. 📚 **Manual research** - Check legal databases and statutes directly
-
-**Rate Limit Information**:
-• Your API key is valid and working
-• You've temporarily exceeded usage limits
-• This is normal with free/trial accounts
-• Adding billing removes most limitations
-
-**Alternative**: Use the offline mode which provides legal research without API calls.
-"""
+        fallback_message = _FALLBACK_MESSAGE_TEMPLATE.format(question=question)
         
         return {
             "answer": fallback_message,
@@ -165,7 +216,7 @@ def handle_openai_error(error_response: Dict[str, Any], question: str = "") -> D
     error_type = error_response.get("error", {}).get("type", "unknown")
     
     if error_type == "rate_limit_exceeded" or "rate limit" in str(error_response).lower():
-        return asyncio.run(rate_limit_handler.handle_rate_limit_error(error_response))
+        return rate_limit_handler.handle_rate_limit_error(error_response)
     
     elif error_type == "invalid_api_key":
         return {
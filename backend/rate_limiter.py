@@ -3,13 +3,15 @@ Advanced rate limiting for the FastAPI backend
 """
 import time
 import logging
-from typing import Dict, Any, Optional
-from collections import defaultdict, deque
+from typing import Dict, Any, Optional, Tuple
+from collections import deque
 from dataclasses import dataclass
 
 from fastapi import HTTPException, Request
 from starlette.middleware.base import BaseHTTPMiddleware
 
+from utils.cache import LRUCache
+
 logger = logging.getLogger(__name__)
 
 @dataclass
@@ -32,22 +34,32 @@ class AdvancedRateLimiter:
             "/sources/add_statutes": RateLimitRule(2, 5, 1),
             "default": RateLimitRule(30, 150, 10)
         }
+        # Endpoint path -> (rule key, rule); bounded since paths can carry ids
+        self._endpoint_rules = LRUCache(10000)
         
-        # Request tracking
-        self.requests = defaultdict(lambda: {
-            "minute": deque(),
-            "hour": deque(),
-            "burst": deque()
-        })
+        # Request tracking: one deque of timestamps per (IP, rule key), oldest
+        # first, capped at the rule's hourly limit; the minute and burst
+        # counts are read from its tail
+        self.requests: Dict[Tuple[str, str], deque] = {}
         
         # Blocked IPs
         self.blocked_ips = {}
         self.block_duration = 300  # 5 minutes
+        
+        # Idle IPs are swept every sweep_interval calls so the per-IP
+        # dicts stay bounded when many distinct addresses show up
+        self.sweep_interval = 1000
+        self._calls_since_sweep = 0
     
     def is_allowed(self, client_ip: str, endpoint: str) -> Dict[str, Any]:
         """
         Check if request is allowed
         
+        Check and record happen in one synchronous call with no await in
+        between, so concurrent requests on the event loop cannot both pass
+        on the same remaining slot. Keep it that way: do not make this
+        method async or call it from worker threads without adding a lock.
+        
         Args:
             client_ip: Client IP address
             endpoint: API endpoint being accessed
@@ -55,7 +67,12 @@ class AdvancedRateLimiter:
         Returns:
             Dict with allowed status and details
         """
-        current_time = time.time()
+        # Monotonic: window and block arithmetic must not jump with the wall clock
+        current_time = time.monotonic()
+        
+        self._calls_since_sweep += 1
+        if self._calls_since_sweep >= self.sweep_interval:
+            self._sweep_idle(current_time)
         
         # Check if IP is blocked
         if self._is_ip_blocked(client_ip, current_time):
@@ -66,16 +83,16 @@ class AdvancedRateLimiter:
             }
         
         # Get rule for endpoint
-        rule = self._get_rule_for_endpoint(endpoint)
-        
-        # Clean old requests
-        self._clean_old_requests(client_ip, current_time)
+        rule_key, rule = self._get_rule_for_endpoint(endpoint)
         
         # Check rate limits
-        client_requests = self.requests[client_ip]
+        client_requests = self.requests.get((client_ip, rule_key))
+        if client_requests is None:
+            client_requests = deque(maxlen=rule.requests_per_hour)
+            self.requests[(client_ip, rule_key)] = client_requests
+        burst_count, minute_count = self._recent_counts(client_requests, current_time)
         
         # Check burst limit (last 10 seconds)
-        burst_count = len([t for t in client_requests["burst"] if current_time - t < 10])
         if burst_count >= rule.burst_limit:
             self._block_ip(client_ip, current_time, "burst_limit")
             return {
@@ -85,7 +102,6 @@ class AdvancedRateLimiter:
             }
         
         # Check minute limit
-        minute_count = len(client_requests["minute"])
         if minute_count >= rule.requests_per_minute:
             return {
                 "allowed": False,
@@ -93,9 +109,12 @@ class AdvancedRateLimiter:
                 "retry_after": 60
             }
         
-        # Check hour limit
-        hour_count = len(client_requests["hour"])
-        if hour_count >= rule.requests_per_hour:
+        # Check hour limit. Stale records are never popped: the deque is
+        # sorted, so a fresh head means every record counts, and a stale
+        # head on a full deque is evicted by the append below. hour_count
+        # may therefore overcount, but only when there is room anyway.
+        hour_count = len(client_requests)
+        if hour_count >= rule.requests_per_hour and current_time - client_requests[0] <= 3600:
             return {
                 "allowed": False,
                 "reason": "Hourly limit exceeded",
@@ -103,43 +122,65 @@ class AdvancedRateLimiter:
             }
         
         # Record this request
-        client_requests["minute"].append(current_time)
-        client_requests["hour"].append(current_time)
-        client_requests["burst"].append(current_time)
+        client_requests.append(current_time)
         
         return {
             "allowed": True,
             "remaining": {
                 "minute": rule.requests_per_minute - minute_count - 1,
-                "hour": rule.requests_per_hour - hour_count - 1,
+                "hour": max(0, rule.requests_per_hour - hour_count - 1),
                 "burst": rule.burst_limit - burst_count - 1
             }
         }
     
-    def _get_rule_for_endpoint(self, endpoint: str) -> RateLimitRule:
-        """Get rate limiting rule for endpoint"""
-        # Find matching rule
-        for pattern, rule in self.rules.items():
-            if pattern in endpoint or pattern == "default":
-                return rule
-        
-        return self.rules["default"]
+    def _get_rule_for_endpoint(self, endpoint: str) -> Tuple[str, RateLimitRule]:
+        """Get (rule key, rate limiting rule) for endpoint"""
+        matched = self._endpoint_rules.get(endpoint)
+        if matched is not None:
+            return matched
+        
+        # First matching pattern in declaration order; "default" only when none match
+        matched = next(
+            ((pattern, rule) for pattern, rule in self.rules.items() if pattern != "default" and pattern in endpoint),
+            ("default", self.rules["default"])
+        )
+        self._endpoint_rules.put(endpoint, matched)
+        return matched
+    
+    @staticmethod
+    def _recent_counts(client_requests: deque, current_time: float) -> Tuple[int, int]:
+        """(requests in the last 10s, requests in the last 60s), scanning newest first"""
+        burst_count = 0
+        minute_count = 0
+        for t in reversed(client_requests):
+            age = current_time - t
+            if age > 60:
+                break
+            minute_count += 1
+            if age < 10:
+                burst_count += 1
+        return burst_count, minute_count
     
-    def _clean_old_requests(self, client_ip: str, current_time: float):
-        """Clean old request records"""
-        client_requests = self.requests[client_ip]
+    def _sweep_idle(self, current_time: float):
+        """Forget IP windows with no request in the last hour and expired blocks"""
+        self._calls_since_sweep = 0
         
-        # Clean minute window
-        while client_requests["minute"] and current_time - client_requests["minute"][0] > 60:
-            client_requests["minute"].popleft()
+        idle = [
+            key for key, timestamps in self.requests.items()
+            if not timestamps or current_time - timestamps[-1] > 3600
+        ]
+        for key in idle:
+            del self.requests[key]
         
-        # Clean hour window
-        while client_requests["hour"] and current_time - client_requests["hour"][0] > 3600:
-            client_requests["hour"].popleft()
+        expired = [
+            ip for ip, block_time in self.blocked_ips.items()
+            if current_time - block_time >= self.block_duration
+        ]
+        for ip in expired:
+            del self.blocked_ips[ip]
         
-        # Clean burst window
-        while client_requests["burst"] and current_time - client_requests["burst"][0] > 10:
-            client_requests["burst"].popleft()
+        if idle or expired:
+            logger.debug(f"Rate limiter swept {len(idle)} idle windows and {len(expired)} expired blocks")
     
     def _is_ip_blocked(self, client_ip: str, current_time: float) -> bool:
         """Check if IP is currently blocked"""
@@ -179,7 +220,7 @@ class RateLimitMiddleware(BaseHTTPMiddleware):
         client_ip = self._get_client_ip(request)
         endpoint = request.url.path
         
-        # Check rate limit
+        # Check rate limit (atomic on the event loop, see is_allowed)
         limit_result = self.rate_limiter.is_allowed(client_ip, endpoint)
         
         if not limit_result["allowed"]:
@@ -2,22 +2,56 @@
 Legal document retrieval using InLegalBERT embeddings and BM25
 """
 import os
-import json
+import heapq
+import asyncio
 import logging
 import pickle
-from typing import List, Dict, Any, Optional
+from collections import defaultdict
+from operator import itemgetter
+from typing import List, Dict, Any, Optional, Tuple
 from pathlib import Path
 
 import numpy as np
 import torch
 from transformers import AutoTokenizer, AutoModel
 import faiss
-from rank_bm25 import BM25Okapi
 
+from utils import fastjson
+from utils.aio import run_blocking
+from utils.bm25 import IncrementalBM25
+from utils.cache import LRUCache
 from utils.textnorm import normalize_text, is_devanagari_text, split_mixed_script_query
 
 logger = logging.getLogger(__name__)
 
+# Below this many vectors an exact flat scan is fast enough; above it the
+# dense index becomes an HNSW graph (approximate, roughly log N per query)
+HNSW_MIN_VECTORS = 10000
+HNSW_M = 32
+HNSW_EF_CONSTRUCTION = 200
+HNSW_EF_SEARCH = 64
+
+# FAISS_INDEX=sq8 stores vectors as 8-bit scalar-quantized codes (4x less
+# index memory, small recall loss); the default "auto" is flat/HNSW as above
+FAISS_INDEX = os.getenv("FAISS_INDEX", "auto").lower()
+
+# faiss-gpu builds can serve flat indexes from GPU memory (HNSW is CPU-only)
+FAISS_GPU_AVAILABLE = hasattr(faiss, "StandardGpuResources") and faiss.get_num_gpus() > 0
+
+# add_chunks calls within this many seconds of each other share one save
+SAVE_DEBOUNCE_SECONDS = 2.0
+
+# inference_mode (torch>=1.9) also skips autograd version counters; older
+# torch falls back to no_grad
+_inference_mode = getattr(torch, "inference_mode", torch.no_grad)
+
+# Let fp32 matmuls use TF32 tensor cores on Ampere+ GPUs; the L2-normalised
+# embeddings are insensitive to the reduced mantissa
+torch.backends.cuda.matmul.allow_tf32 = True
+
+async def _no_hits() -> List[Tuple[int, float]]:
+    return []
+
 class LegalRetriever:
     """Retrieval system using InLegalBERT embeddings and BM25"""
     
@@ -28,13 +62,27 @@ class LegalRetriever:
         
         # Storage
         self.chunks: List[Dict[str, Any]] = []
+        # doc_id -> that document's chunks, in insertion order
+        self._by_doc_id: Dict[str, List[Dict[str, Any]]] = defaultdict(list)
         self.embeddings: Optional[np.ndarray] = None
         self.faiss_index: Optional[faiss.Index] = None
-        self.bm25: Optional[BM25Okapi] = None
+        # Normalized query -> embedding; the encoder is fixed, so no expiry
+        self._query_embeddings = LRUCache(1024)
+        self._faiss_gpu_res = None  # StandardGpuResources, once a GPU index exists
+        # Corpus size the SQ8 quantizer ranges were last trained on
+        self._sq8_trained_on = 0
+        # IncrementalBM25; older bm25.pkl files may hold a rank_bm25/bm25s
+        # index, which is replaced by a full rebuild on the next add_chunks
+        self.bm25: Optional[Any] = None
         
         # Paths
         self.embeddings_dir = Path("data/embeddings")
         self.embeddings_dir.mkdir(exist_ok=True)
+        
+        # Debounced background persistence, see _schedule_save()
+        self._save_task: Optional[asyncio.Task] = None
+        self._save_lock: Optional[asyncio.Lock] = None
+        self._dirty = False
     
     async def initialize(self):
         """Initialize InLegalBERT model and load existing data"""
@@ -45,10 +93,11 @@ class LegalRetriever:
             self.tokenizer = AutoTokenizer.from_pretrained(self.embed_model_name)
             self.model = AutoModel.from_pretrained(self.embed_model_name)
             
-            # Move to GPU if available
+            # Move to GPU if available; fp16 halves activation traffic there
             if torch.cuda.is_available():
-                self.model = self.model.cuda()
-                logger.info("InLegalBERT model moved to GPU")
+                self.model = self.model.cuda().half()
+                logger.info("InLegalBERT model moved to GPU (fp16)")
+            self.model.eval()
             
             # Load existing embeddings if available
             await self._load_existing_data()
@@ -67,20 +116,34 @@ class LegalRetriever:
             index_path = self.embeddings_dir / "faiss.index"
             bm25_path = self.embeddings_dir / "bm25.pkl"
             
-            if all(p.exists() for p in [chunks_path, embeddings_path, index_path, bm25_path]):
+            if all(p.exists() for p in [chunks_path, embeddings_path, index_path]):
                 # Load chunks
-                with open(chunks_path, "r", encoding="utf-8") as f:
-                    self.chunks = json.load(f)
+                with open(chunks_path, "rb") as f:
+                    self.chunks = fastjson.loads(f.read())
+                self._index_doc_ids(self.chunks)
                 
                 # Load embeddings
                 self.embeddings = np.load(embeddings_path)
                 
                 # Load FAISS index
                 self.faiss_index = faiss.read_index(str(index_path))
+                if isinstance(self.faiss_index, faiss.IndexHNSW):
+                    self.faiss_index.hnsw.efSearch = HNSW_EF_SEARCH
+                elif isinstance(self.faiss_index, faiss.IndexScalarQuantizer):
+                    self._sq8_trained_on = self.faiss_index.ntotal
+                self.faiss_index = self._index_to_gpu(self.faiss_index)
+                
+                # Load BM25; the pickled postings are the tokenized corpus, so
+                # chunks are only re-tokenized when there is no usable index
+                if bm25_path.exists():
+                    with open(bm25_path, "rb") as f:
+                        self.bm25 = pickle.load(f)
                 
-                # Load BM25
-                with open(bm25_path, "rb") as f:
-                    self.bm25 = pickle.load(f)
+                if not isinstance(self.bm25, IncrementalBM25) or self.bm25.corpus_size != len(self.chunks):
+                    logger.info("BM25 index missing or outdated, rebuilding it once from chunks")
+                    self._build_bm25_index()
+                    self._dirty = True
+                    self._schedule_save()
                 
                 logger.info(f"Loaded {len(self.chunks)} existing chunks")
             else:
@@ -90,6 +153,7 @@ class LegalRetriever:
         except Exception as e:
             logger.warning(f"Failed to load existing data: {e}")
             self.chunks = []
+            self._by_doc_id.clear()
     
     async def add_chunks(self, new_chunks: List[Dict[str, Any]]):
         """Add new chunks and update embeddings"""
@@ -102,22 +166,32 @@ class LegalRetriever:
             # Generate embeddings for new chunks
             new_embeddings = await self._generate_embeddings([chunk["text"] for chunk in new_chunks])
             
-            # Add to existing data
-            self.chunks.extend(new_chunks)
-            
-            if self.embeddings is None:
-                self.embeddings = new_embeddings
-            else:
-                self.embeddings = np.vstack([self.embeddings, new_embeddings])
-            
-            # Rebuild FAISS index
-            self._build_faiss_index()
-            
-            # Rebuild BM25 index
-            self._build_bm25_index()
+            # Indexes are mutated only while no save is reading them
+            async with self._get_save_lock():
+                # Add to existing data
+                indexed_count = len(self.chunks)
+                self.chunks.extend(new_chunks)
+                self._index_doc_ids(new_chunks)
+                
+                if self.embeddings is None:
+                    self.embeddings = new_embeddings
+                else:
+                    self.embeddings = np.vstack([self.embeddings, new_embeddings])
+                
+                # Extend the FAISS index, or rebuild it when its type changes
+                await self._update_faiss_index(new_embeddings)
+                
+                # Extend the BM25 index in place when it covers exactly the old
+                # chunks; off the loop, since add() waits out in-flight scoring
+                if isinstance(self.bm25, IncrementalBM25) and self.bm25.corpus_size == indexed_count:
+                    await run_blocking(self.bm25.add, [self._bm25_tokens(chunk) for chunk in new_chunks])
+                else:
+                    self._build_bm25_index()
+                
+                self._dirty = True
             
-            # Save updated data
-            await self._save_data()
+            # Persist in the background, coalescing bursts of additions
+            self._schedule_save()
             
             logger.info(f"Successfully added {len(new_chunks)} chunks")
             
@@ -125,89 +199,178 @@ class LegalRetriever:
             logger.error(f"Failed to add chunks: {e}")
             raise
     
+    def _index_doc_ids(self, chunks: List[Dict[str, Any]]):
+        for chunk in chunks:
+            self._by_doc_id[chunk["doc_id"]].append(chunk)
+    
     async def _generate_embeddings(self, texts: List[str]) -> np.ndarray:
         """Generate InLegalBERT embeddings for texts"""
         try:
-            embeddings = []
-            batch_size = 32
+            # Forward passes run in a worker thread so they don't block the loop
+            return await run_blocking(self._embed_sync, texts)
+            
+        except Exception as e:
+            logger.error(f"Failed to generate embeddings: {e}")
+            raise
+    
+    def _embed_sync(self, texts: List[str]) -> np.ndarray:
+        """Tokenize and embed texts in batches (blocking)"""
+        batch_size = 32
+        
+        # Batch texts of similar length so padding=True pads each batch only
+        # to its own longest text; rows are written back in input order
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        all_embeddings = None
+        
+        for i in range(0, len(order), batch_size):
+            batch_ids = order[i:i + batch_size]
+            batch_texts = [texts[j] for j in batch_ids]
+            
+            # Tokenize
+            inputs = self.tokenizer(
+                batch_texts,
+                padding=True,
+                truncation=True,
+                max_length=512,
+                return_tensors="pt"
+            )
             
-            for i in range(0, len(texts), batch_size):
-                batch_texts = texts[i:i + batch_size]
+            # Move to GPU if available; pinned host memory lets the copy
+            # overlap with kernel launch
+            if torch.cuda.is_available():
+                inputs = {k: v.pin_memory().cuda(non_blocking=True) for k, v in inputs.items()}
+            
+            # Generate embeddings
+            with _inference_mode():
+                outputs = self.model(**inputs)
                 
-                # Tokenize
-                inputs = self.tokenizer(
-                    batch_texts,
-                    padding=True,
-                    truncation=True,
-                    max_length=512,
-                    return_tensors="pt"
-                )
+                # Mean pooling with attention mask, in fp32 even for fp16 models
+                last_hidden_states = outputs.last_hidden_state.float()
+                attention_mask = inputs["attention_mask"].unsqueeze(1).float()  # [B, 1, L]
                 
-                # Move to GPU if available
-                if torch.cuda.is_available():
-                    inputs = {k: v.cuda() for k, v in inputs.items()}
+                # Masked sum as a batched [1, L] x [L, H] matmul, so no
+                # [B, L, H] masked copy of the hidden states is materialised
+                sum_embeddings = torch.bmm(attention_mask, last_hidden_states).squeeze(1)
+                sum_mask = torch.clamp(attention_mask.sum(2), min=1e-9)
+                mean_embeddings = sum_embeddings / sum_mask
                 
-                # Generate embeddings
-                with torch.no_grad():
-                    outputs = self.model(**inputs)
-                    
-                    # Mean pooling with attention mask
-                    last_hidden_states = outputs.last_hidden_state
-                    attention_mask = inputs["attention_mask"]
-                    
-                    # Expand attention mask to match hidden states
-                    mask_expanded = attention_mask.unsqueeze(-1).expand(last_hidden_states.size()).float()
-                    
-                    # Apply mask and compute mean
-                    sum_embeddings = torch.sum(last_hidden_states * mask_expanded, 1)
-                    sum_mask = torch.clamp(mask_expanded.sum(1), min=1e-9)
-                    mean_embeddings = sum_embeddings / sum_mask
-                    
-                    # L2 normalize
-                    embeddings_batch = torch.nn.functional.normalize(mean_embeddings, p=2, dim=1)
-                    
-                    embeddings.append(embeddings_batch.cpu().numpy())
-            
-            # Concatenate all batches
-            all_embeddings = np.vstack(embeddings)
-            logger.info(f"Generated embeddings for {len(texts)} texts")
-            
-            return all_embeddings
+                # L2 normalize
+                embeddings_batch = torch.nn.functional.normalize(mean_embeddings, p=2, dim=1).cpu().numpy()
             
-        except Exception as e:
-            logger.error(f"Failed to generate embeddings: {e}")
-            raise
+            if all_embeddings is None:
+                all_embeddings = np.empty((len(texts), embeddings_batch.shape[1]), dtype=np.float32)
+            all_embeddings[batch_ids] = embeddings_batch
+        
+        logger.info(f"Generated embeddings for {len(texts)} texts")
+        
+        return all_embeddings
+    
+    @staticmethod
+    def _faiss_kind(index: Optional[faiss.Index]) -> Optional[str]:
+        if index is None:
+            return None
+        if isinstance(index, faiss.IndexScalarQuantizer):
+            return "sq8"
+        if isinstance(index, faiss.IndexHNSW):
+            return "hnsw"
+        return "flat"  # IndexFlatIP, on CPU or GPU
+    
+    @staticmethod
+    def _faiss_kind_for(n_vectors: int) -> str:
+        if FAISS_INDEX == "sq8":
+            return "sq8"
+        return "flat" if n_vectors < HNSW_MIN_VECTORS else "hnsw"
+    
+    async def _update_faiss_index(self, new_embeddings: np.ndarray):
+        """
+        Bring the FAISS index up to date after new_embeddings were appended
+        
+        All work runs off the event loop. The live index is never mutated:
+        the updated one is built on the side and swapped in, so searches
+        running in worker threads always see a complete index.
+        """
+        n_vectors = len(self.embeddings)
+        kind = self._faiss_kind_for(n_vectors)
+        current = self._faiss_kind(self.faiss_index)
+        
+        # HNSW links in only the new vectors; SQ8 encodes them with its
+        # trained ranges, retraining once the corpus has doubled since (so
+        # retraining stays amortised O(1) per vector)
+        if current == kind == "hnsw" or (current == kind == "sq8" and n_vectors < 2 * self._sq8_trained_on):
+            self.faiss_index = await run_blocking(self._extend_faiss_index, self.faiss_index, new_embeddings)
+            return
+        
+        # First build, the corpus just crossed HNSW_MIN_VECTORS, SQ8
+        # retraining, or a flat index, where copying the vectors is all a
+        # rebuild costs
+        self.faiss_index = await run_blocking(self._build_faiss_index, self.embeddings)
+        if kind == "sq8":
+            self._sq8_trained_on = n_vectors
     
-    def _build_faiss_index(self):
-        """Build FAISS index for dense retrieval"""
+    @staticmethod
+    def _extend_faiss_index(index: faiss.Index, new_embeddings: np.ndarray) -> faiss.Index:
+        """Copy of a CPU index with new_embeddings added (blocking)"""
+        extended = faiss.clone_index(index)
+        extended.add(new_embeddings.astype(np.float32))
+        logger.info(f"Extended FAISS index to {extended.ntotal} vectors")
+        return extended
+    
+    def _build_faiss_index(self, embeddings: np.ndarray) -> faiss.Index:
+        """Build FAISS index for dense retrieval over all embeddings (blocking)"""
         try:
-            if self.embeddings is None or len(self.embeddings) == 0:
-                return
-            
-            # Create IndexFlatIP for cosine similarity (inner product on normalized vectors)
-            dimension = self.embeddings.shape[1]
-            self.faiss_index = faiss.IndexFlatIP(dimension)
+            # Inner product on normalized vectors = cosine similarity
+            dimension = embeddings.shape[1]
+            vectors = embeddings.astype(np.float32)
+            kind = self._faiss_kind_for(len(embeddings))
+            if kind == "sq8":
+                index = faiss.IndexScalarQuantizer(
+                    dimension, faiss.ScalarQuantizer.QT_8bit, faiss.METRIC_INNER_PRODUCT
+                )
+                # Training only records per-dimension value ranges
+                index.train(vectors)
+            elif kind == "flat":
+                index = faiss.IndexFlatIP(dimension)
+            else:
+                index = faiss.IndexHNSWFlat(dimension, HNSW_M, faiss.METRIC_INNER_PRODUCT)
+                index.hnsw.efConstruction = HNSW_EF_CONSTRUCTION
+                index.hnsw.efSearch = HNSW_EF_SEARCH
             
             # Add embeddings
-            self.faiss_index.add(self.embeddings.astype(np.float32))
+            index = self._index_to_gpu(index)
+            index.add(vectors)
             
-            logger.info(f"Built FAISS index with {self.faiss_index.ntotal} vectors")
+            logger.info(f"Built FAISS index with {index.ntotal} vectors")
+            return index
             
         except Exception as e:
             logger.error(f"Failed to build FAISS index: {e}")
             raise
     
+    @staticmethod
+    def _bm25_tokens(chunk: Dict[str, Any]) -> List[str]:
+        return chunk["text"].lower().split()
+    
+    def _index_to_gpu(self, index: faiss.Index) -> faiss.Index:
+        """Move a flat index to GPU 0 when faiss-gpu and a GPU are available"""
+        if not FAISS_GPU_AVAILABLE or not isinstance(index, faiss.IndexFlat):
+            return index
+        if self._faiss_gpu_res is None:
+            self._faiss_gpu_res = faiss.StandardGpuResources()
+        return faiss.index_cpu_to_gpu(self._faiss_gpu_res, 0, index)
+    
     def _build_bm25_index(self):
-        """Build BM25 index for sparse retrieval"""
+        """Build BM25 index for sparse retrieval from all chunks"""
         try:
             if not self.chunks:
                 return
             
-            # Tokenize texts for BM25
-            tokenized_corpus = [chunk["text"].lower().split() for chunk in self.chunks]
-            self.bm25 = BM25Okapi(tokenized_corpus)
+            # Built on the side and swapped in, so concurrent searches see
+            # either the old index or the complete new one
+            bm25 = IncrementalBM25()
+            bm25.add(self._bm25_tokens(chunk) for chunk in self.chunks)
+            self.bm25 = bm25
             
-            logger.info(f"Built BM25 index with {len(tokenized_corpus)} documents")
+            logger.info(f"Built BM25 index with {self.bm25.corpus_size} documents")
             
         except Exception as e:
             logger.error(f"Failed to build BM25 index: {e}")
@@ -218,7 +381,8 @@ class LegalRetriever:
         query: str, 
         max_results: int = 5,
         dense_weight: float = 0.7,
-        sparse_weight: float = 0.3
+        sparse_weight: float = 0.3,
+        query_embedding: Optional[np.ndarray] = None
     ) -> List[Dict[str, Any]]:
         """
         Search for relevant chunks using hybrid dense + sparse retrieval
@@ -228,6 +392,7 @@ class LegalRetriever:
             max_results: Maximum number of results to return
             dense_weight: Weight for dense (FAISS) scores
             sparse_weight: Weight for sparse (BM25) scores
+            query_embedding: Precomputed embed_query(query), if the caller has it
             
         Returns:
             List of relevant chunks with scores
@@ -242,55 +407,78 @@ class LegalRetriever:
             # Handle mixed script queries
             query_parts = split_mixed_script_query(normalized_query)
             
-            # Get dense retrieval results
-            dense_results = await self._dense_search(normalized_query, max_results * 2)
-            
-            # Get sparse retrieval results
-            sparse_results = self._sparse_search(normalized_query, max_results * 2)
-            
-            # Combine and rerank results
-            combined_results = self._combine_results(
-                dense_results, sparse_results, dense_weight, sparse_weight
+            # Dense and sparse retrieval share no state, so they run
+            # concurrently; a zero-weighted side is skipped entirely
+            dense_results, sparse_results = await asyncio.gather(
+                self._dense_search(normalized_query, max_results * 2, query_embedding)
+                if dense_weight > 0 else _no_hits(),
+                run_blocking(self._sparse_search, normalized_query, max_results * 2)
+                if sparse_weight > 0 else _no_hits()
             )
             
-            # Return top results
-            return combined_results[:max_results]
+            # Combine and rerank results, materialising only the top ones
+            return self._combine_results(
+                dense_results, sparse_results, dense_weight, sparse_weight, max_results
+            )
             
         except Exception as e:
             logger.error(f"Search failed for query '{query}': {e}")
             return []
     
-    async def _dense_search(self, query: str, k: int) -> List[Dict[str, Any]]:
-        """Dense retrieval using FAISS and InLegalBERT"""
+    async def embed_query(self, query: str) -> Optional[np.ndarray]:
+        """L2-normalised InLegalBERT embedding of a query, as used for dense search; None if unavailable"""
+        if self.model is None:
+            return None
+        try:
+            return await self._embed_normalized_query(normalize_text(query))
+        except Exception as e:
+            logger.warning(f"Query embedding failed: {e}")
+            return None
+    
+    async def _embed_normalized_query(self, normalized_query: str) -> np.ndarray:
+        """Embedding for an already-normalized query, cached per query string"""
+        embedding = self._query_embeddings.get(normalized_query)
+        if embedding is None:
+            embedding = (await self._generate_embeddings([normalized_query]))[0]
+            self._query_embeddings.put(normalized_query, embedding)
+        return embedding
+    
+    async def _dense_search(
+        self,
+        query: str,
+        k: int,
+        query_embedding: Optional[np.ndarray] = None
+    ) -> List[Tuple[int, float]]:
+        """Dense retrieval using FAISS and InLegalBERT; (chunk index, score) pairs"""
         try:
             if self.faiss_index is None or self.faiss_index.ntotal == 0:
                 return []
             
-            # Generate query embedding
-            query_embedding = await self._generate_embeddings([query])
+            # Generate query embedding unless the caller already has it
+            if query_embedding is None:
+                query_embedding = await self._embed_normalized_query(query)
+            query_embedding = query_embedding.reshape(1, -1)
             
-            # Search FAISS index
-            scores, indices = self.faiss_index.search(
-                query_embedding.astype(np.float32), 
+            # Search FAISS index (off the loop; FAISS releases the GIL)
+            scores, indices = await run_blocking(
+                self.faiss_index.search,
+                query_embedding.astype(np.float32),
                 min(k, self.faiss_index.ntotal)
             )
             
-            # Format results
-            results = []
-            for score, idx in zip(scores[0], indices[0]):
-                if idx < len(self.chunks):
-                    chunk = self.chunks[idx].copy()
-                    chunk["dense_score"] = float(score)
-                    results.append(chunk)
-            
-            return results
+            # FAISS pads with -1 when it finds fewer than k neighbours
+            return [
+                (int(idx), float(score))
+                for score, idx in zip(scores[0], indices[0])
+                if 0 <= idx < len(self.chunks)
+            ]
             
         except Exception as e:
             logger.error(f"Dense search failed: {e}")
             return []
     
-    def _sparse_search(self, query: str, k: int) -> List[Dict[str, Any]]:
-        """Sparse retrieval using BM25"""
+    def _sparse_search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Sparse retrieval using BM25; (chunk index, score) pairs"""
         try:
             if self.bm25 is None:
                 return []
@@ -301,18 +489,18 @@ class LegalRetriever:
             # Get BM25 scores
             scores = self.bm25.get_scores(query_tokens)
             
-            # Get top k indices
-            top_indices = np.argsort(scores)[::-1][:k]
-            
-            # Format results
-            results = []
-            for idx in top_indices:
-                if idx < len(self.chunks):
-                    chunk = self.chunks[idx].copy()
-                    chunk["sparse_score"] = float(scores[idx])
-                    results.append(chunk)
+            # Top k indices: O(N) partition, then sort only those k
+            k = min(k, len(scores))
+            if k <= 0:
+                return []
+            top_indices = np.argpartition(scores, -k)[-k:]
+            top_indices = top_indices[np.argsort(scores[top_indices])[::-1]]
             
-            return results
+            return [
+                (int(idx), float(scores[idx]))
+                for idx in top_indices
+                if idx < len(self.chunks)
+            ]
             
         except Exception as e:
             logger.error(f"Sparse search failed: {e}")
@@ -320,51 +508,50 @@ class LegalRetriever:
     
     def _combine_results(
         self, 
-        dense_results: List[Dict[str, Any]], 
-        sparse_results: List[Dict[str, Any]],
+        dense_results: List[Tuple[int, float]], 
+        sparse_results: List[Tuple[int, float]],
         dense_weight: float,
-        sparse_weight: float
+        sparse_weight: float,
+        max_results: int
     ) -> List[Dict[str, Any]]:
-        """Combine and rerank dense and sparse results"""
-        
-        # Create a map of chunk_id to results
-        result_map = {}
+        """Combine and rerank dense and sparse hits into the top max_results chunks"""
         
-        # Add dense results
-        for result in dense_results:
-            chunk_id = result["chunk_id"]
-            result_map[chunk_id] = result
-            result_map[chunk_id]["combined_score"] = result.get("dense_score", 0) * dense_weight
+        # Chunk index -> [dense score, sparse score or None]
+        hit_scores: Dict[int, list] = {idx: [score, None] for idx, score in dense_results}
+        for idx, score in sparse_results:
+            hit_scores.setdefault(idx, [0.0, None])[1] = score
         
-        # Add sparse results
-        for result in sparse_results:
-            chunk_id = result["chunk_id"]
-            if chunk_id in result_map:
-                # Combine scores
-                result_map[chunk_id]["combined_score"] += result.get("sparse_score", 0) * sparse_weight
-                result_map[chunk_id]["sparse_score"] = result.get("sparse_score", 0)
-            else:
-                # New result from sparse only
-                result["combined_score"] = result.get("sparse_score", 0) * sparse_weight
-                result["dense_score"] = 0.0
-                result_map[chunk_id] = result
+        # Partial sort: O(n log k) for the k results actually returned
+        ranked = heapq.nlargest(
+            max_results,
+            (
+                (dense * dense_weight + (sparse or 0.0) * sparse_weight, idx)
+                for idx, (dense, sparse) in hit_scores.items()
+            ),
+            key=itemgetter(0)
+        )
         
-        # Sort by combined score
-        combined_results = list(result_map.values())
-        combined_results.sort(key=lambda x: x.get("combined_score", 0), reverse=True)
+        # Only the returned chunks are copied out of self.chunks
+        combined_results = []
+        for combined_score, idx in ranked:
+            dense, sparse = hit_scores[idx]
+            result = self.chunks[idx].copy()
+            result["dense_score"] = dense
+            if sparse is not None:
+                result["sparse_score"] = sparse
+            result["combined_score"] = combined_score
+            combined_results.append(result)
         
         return combined_results
     
     async def get_document_content(self, doc_id: str) -> str:
         """Get full content of a document by ID"""
         try:
-            doc_chunks = [chunk for chunk in self.chunks if chunk["doc_id"] == doc_id]
-            
-            if not doc_chunks:
+            if doc_id not in self._by_doc_id:
                 raise ValueError(f"Document {doc_id} not found")
             
             # Sort chunks by index
-            doc_chunks.sort(key=lambda x: x.get("chunk_index", 0))
+            doc_chunks = sorted(self._by_doc_id[doc_id], key=lambda x: x.get("chunk_index", 0))
             
             # Combine chunk texts
             full_text = "\n\n".join(chunk["text"] for chunk in doc_chunks)
@@ -377,59 +564,106 @@ class LegalRetriever:
     async def get_sources_status(self) -> Dict[str, Any]:
         """Get status of ingested sources"""
         try:
-            # Group chunks by document
-            doc_groups = {}
-            for chunk in self.chunks:
-                doc_id = chunk["doc_id"]
-                if doc_id not in doc_groups:
-                    doc_groups[doc_id] = {
-                        "doc_id": doc_id,
-                        "filename": chunk.get("filename", "Unknown"),
-                        "chunk_count": 0,
-                        "total_chars": 0,
-                        "has_devanagari": False
-                    }
-                
-                doc_groups[doc_id]["chunk_count"] += 1
-                doc_groups[doc_id]["total_chars"] += chunk.get("char_count", 0)
-                if chunk.get("is_devanagari", False):
-                    doc_groups[doc_id]["has_devanagari"] = True
+            # Chunks are already grouped by document
+            documents = [
+                {
+                    "doc_id": doc_id,
+                    "filename": doc_chunks[0].get("filename", "Unknown"),
+                    "chunk_count": len(doc_chunks),
+                    "total_chars": sum(chunk.get("char_count", 0) for chunk in doc_chunks),
+                    "has_devanagari": any(chunk.get("is_devanagari", False) for chunk in doc_chunks)
+                }
+                for doc_id, doc_chunks in self._by_doc_id.items()
+            ]
             
             return {
-                "total_documents": len(doc_groups),
+                "total_documents": len(documents),
                 "total_chunks": len(self.chunks),
                 "embedding_dimension": self.embeddings.shape[1] if self.embeddings is not None else 0,
                 "faiss_index_size": self.faiss_index.ntotal if self.faiss_index else 0,
                 "bm25_initialized": self.bm25 is not None,
-                "documents": list(doc_groups.values())
+                "documents": documents
             }
             
         except Exception as e:
             logger.error(f"Failed to get sources status: {e}")
             return {"error": str(e)}
     
-    async def _save_data(self):
-        """Save chunks and embeddings to disk"""
+    def _get_save_lock(self) -> asyncio.Lock:
+        # Created on first use so it binds to the running event loop
+        if self._save_lock is None:
+            self._save_lock = asyncio.Lock()
+        return self._save_lock
+    
+    def _schedule_save(self):
+        """(Re)start the debounce timer for a background save"""
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+        self._save_task = asyncio.get_event_loop().create_task(self._debounced_save())
+    
+    async def _debounced_save(self):
+        await asyncio.sleep(SAVE_DEBOUNCE_SECONDS)
         try:
-            # Save chunks
-            with open(self.embeddings_dir / "chunks.json", "w", encoding="utf-8") as f:
-                json.dump(self.chunks, f, indent=2, ensure_ascii=False)
-            
-            # Save embeddings
-            if self.embeddings is not None:
-                np.save(self.embeddings_dir / "embeddings.npy", self.embeddings)
-            
-            # Save FAISS index
-            if self.faiss_index is not None:
-                faiss.write_index(self.faiss_index, str(self.embeddings_dir / "faiss.index"))
-            
-            # Save BM25
-            if self.bm25 is not None:
-                with open(self.embeddings_dir / "bm25.pkl", "wb") as f:
-                    pickle.dump(self.bm25, f)
-            
-            logger.info("Successfully saved retrieval data")
-            
-        except Exception as e:
-            logger.error(f"Failed to save retrieval data: {e}")
-            raise
\ No newline at end of file
+            # Shielded: a newer debounce timer must not interrupt a running write
+            await asyncio.shield(self._save_data())
+        except asyncio.CancelledError:
+            pass
+        except Exception:
+            pass  # already logged by _save_data; the next add retries
+    
+    async def flush(self):
+        """Write out any unsaved additions now; call at shutdown"""
+        if self._save_task is not None and not self._save_task.done():
+            self._save_task.cancel()
+        # Waits for an in-flight save, then saves only if still dirty
+        await self._save_data(only_if_dirty=True)
+    
+    async def _save_data(self, only_if_dirty: bool = False):
+        """Save chunks and embeddings to disk without blocking the event loop"""
+        async with self._get_save_lock():
+            if only_if_dirty and not self._dirty:
+                return
+            self._dirty = False
+            try:
+                await run_blocking(self._save_data_sync)
+            except Exception as e:
+                self._dirty = True
+                logger.error(f"Failed to save retrieval data: {e}")
+                raise
+    
+    def _save_data_sync(self):
+        """Write each file under a temp name and os.replace it, so a crash never leaves a torn file"""
+        def tmp_for(path: Path) -> Path:
+            return path.with_name(path.name + ".tmp")
+        
+        # Save chunks as compact JSON (orjson when installed)
+        chunks_path = self.embeddings_dir / "chunks.json"
+        with open(tmp_for(chunks_path), "wb") as f:
+            f.write(fastjson.dumps(self.chunks))
+        os.replace(tmp_for(chunks_path), chunks_path)
+        
+        # Save embeddings (through a file object: np.save would append .npy to the temp name)
+        if self.embeddings is not None:
+            embeddings_path = self.embeddings_dir / "embeddings.npy"
+            with open(tmp_for(embeddings_path), "wb") as f:
+                np.save(f, self.embeddings)
+            os.replace(tmp_for(embeddings_path), embeddings_path)
+        
+        # Save FAISS index
+        if self.faiss_index is not None:
+            index_path = self.embeddings_dir / "faiss.index"
+            index = self.faiss_index
+            if FAISS_GPU_AVAILABLE and isinstance(index, faiss.GpuIndex):
+                # GPU indexes must be copied back to host before serialising
+                index = faiss.index_gpu_to_cpu(index)
+            faiss.write_index(index, str(tmp_for(index_path)))
+            os.replace(tmp_for(index_path), index_path)
+        
+        # Save BM25
+        if self.bm25 is not None:
+            bm25_path = self.embeddings_dir / "bm25.pkl"
+            with open(tmp_for(bm25_path), "wb") as f:
+                pickle.dump(self.bm25, f)
+            os.replace(tmp_for(bm25_path), bm25_path)
+        
+        logger.info("Successfully saved retrieval data")
\ No newline at end of file
@@ -5,22 +5,32 @@ End-to-end smoke tests for InLegalDesk backend
 import asyncio
 import logging
 import tempfile
-import json
 import os
 from pathlib import Path
 from typing import Dict, Any
 import httpx
 
+from utils import fastjson
+
 # Configure logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Request bodies are pre-encoded with fastjson, so the type is set by hand
+_JSON_HEADERS = {"Content-Type": "application/json"}
+
 class E2ETestRunner:
     """End-to-end test runner"""
     
     def __init__(self, base_url: str = "http://127.0.0.1:8877"):
         self.base_url = base_url
-        self.client = httpx.AsyncClient(timeout=httpx.Timeout(120.0))
+        # One keep-alive pool for every test; sized for tests that run
+        # concurrently, with a short connect timeout so a dead backend
+        # fails fast instead of after the 120s read budget
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(120.0, connect=5.0),
+            limits=httpx.Limits(max_connections=32, max_keepalive_connections=32)
+        )
     
     async def run_all_tests(self):
         """Run all end-to-end tests"""
@@ -33,14 +43,14 @@ class E2ETestRunner:
             # Test 2: Add statutes
             await self.test_add_statutes()
             
-            # Test 3: Upload local PDF (if available)
-            await self.test_upload_document()
-            
-            # Test 4: Ask question about Evidence Act
-            await self.test_ask_question()
-            
-            # Test 5: Generate judgment
-            await self.test_generate_judgment()
+            # Tests 3-5 only need the statutes and share no client-side
+            # state, so they run concurrently: upload a PDF, ask about the
+            # Evidence Act, generate a judgment
+            await asyncio.gather(
+                self.test_upload_document(),
+                self.test_ask_question(),
+                self.test_generate_judgment()
+            )
             
             logger.info("All E2E tests completed successfully!")
             
@@ -57,7 +67,7 @@ class E2ETestRunner:
         response = await self.client.get(f"{self.base_url}/health")
         response.raise_for_status()
         
-        data = response.json()
+        data = fastjson.loads(response.content)
         assert data["status"] == "healthy"
         
         logger.info("✓ Health check passed")
@@ -69,7 +79,7 @@ class E2ETestRunner:
         response = await self.client.post(f"{self.base_url}/sources/add_statutes")
         response.raise_for_status()
         
-        data = response.json()
+        data = fastjson.loads(response.content)
         assert data["status"] == "success"
         
         logger.info("✓ Statute ingestion passed")
@@ -91,7 +101,7 @@ class E2ETestRunner:
                 response = await self.client.post(f"{self.base_url}/documents/upload", files=files)
             
             response.raise_for_status()
-            data = response.json()
+            data = fastjson.loads(response.content)
             
             assert data["status"] == "success"
             assert "document_id" in data
@@ -112,10 +122,12 @@ class E2ETestRunner:
             "max_results": 3
         }
         
-        response = await self.client.post(f"{self.base_url}/ask", json=payload)
+        response = await self.client.post(
+            f"{self.base_url}/ask", content=fastjson.dumps(payload), headers=_JSON_HEADERS
+        )
         response.raise_for_status()
         
-        data = response.json()
+        data = fastjson.loads(response.content)
         assert "answer" in data
         assert "sources" in data
         
@@ -135,10 +147,12 @@ class E2ETestRunner:
             "language": "auto"
         }
         
-        response = await self.client.post(f"{self.base_url}/judgment", json=payload)
+        response = await self.client.post(
+            f"{self.base_url}/judgment", content=fastjson.dumps(payload), headers=_JSON_HEADERS
+        )
         response.raise_for_status()
         
-        data = response.json()
+        data = fastjson.loads(response.content)
         assert "framing" in data
         assert "applicable_law" in data
         
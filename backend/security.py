@@ -6,10 +6,9 @@ import re
 import hashlib
 import secrets
 import logging
-from typing import Dict, Any, Optional, List
+from typing import Dict, Any, Optional, List, Tuple
 from pathlib import Path
 import time
-from collections import defaultdict
 
 try:
     from fastapi import HTTPException, Request, Response
@@ -24,6 +23,32 @@ except ImportError:
 
 logger = logging.getLogger(__name__)
 
+# Validation patterns, compiled once at import
+_SUSPICIOUS_FILENAME = [
+    re.compile(r'[<>:"|?*]'),  # Windows invalid chars
+    re.compile(r'^\.'),        # Hidden files
+    re.compile(r'\.{2,}'),     # Multiple dots
+]
+_QUERY_STRIP = re.compile(r'[<>"]')
+# Used with fullmatch: unlike match() with '$', it rejects a trailing newline
+_API_KEY_RE = re.compile(r'sk-(?:proj-|svcacct-)?[a-zA-Z0-9_-]+')
+
+# blake2b digest of an API key -> validation result. Keyed by digest so the
+# cache never retains a secret; cleared wholesale when it fills up
+_API_KEY_VALIDATION: Dict[bytes, bool] = {}
+_API_KEY_VALIDATION_MAX = 64
+
+# Suspicious PDF name objects, matched in a single pass over the scanned bytes;
+# warnings are reported in this order
+_PDF_MARKER_WARNINGS = {
+    b'/JavaScript': "PDF contains JavaScript",
+    b'/JS': "PDF contains JavaScript",
+    b'/EmbeddedFile': "PDF contains embedded files",
+    b'/Launch': "PDF contains launch actions",
+    b'/OpenAction': "PDF runs an action on open",
+}
+_PDF_MARKER_RE = re.compile(b'|'.join(re.escape(marker) for marker in _PDF_MARKER_WARNINGS))
+
 class SecurityConfig:
     """Security configuration and validation"""
     
@@ -77,14 +102,8 @@ class InputValidator:
             return False
         
         # Check for suspicious patterns
-        suspicious_patterns = [
-            r'[<>:"|?*]',  # Windows invalid chars
-            r'^\.',        # Hidden files
-            r'\.{2,}',     # Multiple dots
-        ]
-        
-        for pattern in suspicious_patterns:
-            if re.search(pattern, filename):
+        for pattern in _SUSPICIOUS_FILENAME:
+            if pattern.search(filename):
                 return False
         
         return True
@@ -101,7 +120,7 @@ class InputValidator:
             return ""
         
         # Remove potential injection patterns
-        query = re.sub(r'[<>"]', '', query)
+        query = _QUERY_STRIP.sub('', query)
         
         # Limit length
         if len(query) > 10000:
@@ -117,10 +136,22 @@ class InputValidator:
     
     @staticmethod
     def validate_api_key(api_key: str) -> bool:
-        """Validate OpenAI API key format - Updated for latest ChatGPT tokens"""
+        """Validate OpenAI API key format, caching the result per key"""
         if not api_key:
             return False
         
+        digest = hashlib.blake2b(api_key.encode(), digest_size=16).digest()
+        is_valid = _API_KEY_VALIDATION.get(digest)
+        if is_valid is None:
+            is_valid = InputValidator._check_api_key_format(api_key)
+            if len(_API_KEY_VALIDATION) >= _API_KEY_VALIDATION_MAX:
+                _API_KEY_VALIDATION.clear()
+            _API_KEY_VALIDATION[digest] = is_valid
+        return is_valid
+    
+    @staticmethod
+    def _check_api_key_format(api_key: str) -> bool:
+        """Validate OpenAI API key format - Updated for latest ChatGPT tokens"""
         # Updated format validation for modern OpenAI API keys
         # Support multiple key formats: sk-, sk-proj-, sk-svcacct-
         valid_prefixes = ['sk-', 'sk-proj-', 'sk-svcacct-']
@@ -133,51 +164,69 @@ class InputValidator:
         if len(api_key) < 20 or len(api_key) > 300:
             return False
         
-        # Check for suspicious patterns (but allow valid characters)
-        # Modern keys can contain: letters, numbers, hyphens, underscores
-        if any(char in api_key for char in [' ', '\n', '\t', '<', '>', '"', "'", '\\', '/', '?', '&', '=', '+', '%', '@', '!', '#', '$', '^', '*', '(', ')', '[', ']', '{', '}', '|', ';', ':', ',', '.', '`', '~']):
-            return False
-        
         # Validate character set - allow letters, numbers, hyphens, underscores
         # Updated pattern to support sk-proj- and sk-svcacct- prefixes
-        import re
-        if not re.match(r'^sk-(?:proj-|svcacct-)?[a-zA-Z0-9_-]+$', api_key):
+        if not _API_KEY_RE.fullmatch(api_key):
             return False
         
         return True
 
 class RateLimitMiddleware(BaseHTTPMiddleware):
-    """Rate limiting middleware"""
+    """Rate limiting middleware (token bucket per IP)"""
     
     def __init__(self, app, requests_per_minute: int = 100):
         super().__init__(app)
         self.requests_per_minute = requests_per_minute
-        self.requests = defaultdict(list)
+        # Bucket holds up to requests_per_minute tokens and refills at
+        # requests_per_minute per window
+        self.capacity = float(requests_per_minute)
+        self.refill_rate = requests_per_minute / SecurityConfig.RATE_LIMIT_WINDOW
+        # IP -> (tokens, last refill time)
+        self.buckets: Dict[str, Tuple[float, float]] = {}
+        
+        # Buckets that have refilled to capacity are dropped every
+        # purge_interval requests; a missing bucket starts full anyway
+        self.purge_interval = 1024
+        self._requests_since_purge = 0
     
     async def dispatch(self, request: Request, call_next):
         """Apply rate limiting"""
         client_ip = self._get_client_ip(request)
-        current_time = time.time()
+        # Monotonic: refill arithmetic must not jump with the wall clock
+        current_time = time.monotonic()
         
-        # Clean old requests
-        self.requests[client_ip] = [
-            req_time for req_time in self.requests[client_ip]
-            if current_time - req_time < SecurityConfig.RATE_LIMIT_WINDOW
-        ]
+        self._requests_since_purge += 1
+        if self._requests_since_purge >= self.purge_interval:
+            self._purge_idle(current_time)
+        
+        # Refill for the time since this IP's last request
+        tokens, last_refill = self.buckets.get(client_ip, (self.capacity, current_time))
+        tokens = min(self.capacity, tokens + (current_time - last_refill) * self.refill_rate)
         
         # Check rate limit
-        if len(self.requests[client_ip]) >= self.requests_per_minute:
+        if tokens < 1:
+            self.buckets[client_ip] = (tokens, current_time)
             raise HTTPException(
                 status_code=429,
                 detail="Rate limit exceeded. Please try again later."
             )
         
         # Record this request
-        self.requests[client_ip].append(current_time)
+        self.buckets[client_ip] = (tokens - 1, current_time)
         
         response = await call_next(request)
         return response
     
+    def _purge_idle(self, current_time: float):
+        """Forget IPs whose bucket has refilled to capacity"""
+        self._requests_since_purge = 0
+        idle = [
+            ip for ip, (tokens, last_refill) in self.buckets.items()
+            if tokens + (current_time - last_refill) * self.refill_rate >= self.capacity
+        ]
+        for ip in idle:
+            del self.buckets[ip]
+    
     def _get_client_ip(self, request: Request) -> str:
         """Get client IP address"""
         # Check for forwarded headers (proxy/load balancer)
@@ -226,33 +275,32 @@ class FileSecurityValidator:
         }
         
         try:
-            # Check file exists and size
-            if not Path(file_path).exists():
+            # Check file exists and size (one stat call)
+            try:
+                file_size = os.stat(file_path).st_size
+            except FileNotFoundError:
                 results["errors"].append("File does not exist")
                 return results
             
-            file_size = Path(file_path).stat().st_size
             if not InputValidator.validate_file_size(file_size):
                 results["errors"].append(f"File too large: {file_size} bytes")
                 return results
             
+            # Header and embedded-content checks share one unbuffered read
+            # of the first 1KB
+            with open(file_path, 'rb', buffering=0) as f:
+                content = f.read(1024)
+            
             # Basic PDF validation
-            with open(file_path, 'rb') as f:
-                header = f.read(8)
-                if not header.startswith(b'%PDF-'):
-                    results["errors"].append("Not a valid PDF file")
-                    return results
+            if not content.startswith(b'%PDF-'):
+                results["errors"].append("Not a valid PDF file")
+                return results
             
-            # Check for embedded content (basic)
-            with open(file_path, 'rb') as f:
-                content = f.read(1024)  # First 1KB
-                
-                # Check for suspicious content
-                if b'/JavaScript' in content or b'/JS' in content:
-                    results["warnings"].append("PDF contains JavaScript")
-                
-                if b'/EmbeddedFile' in content:
-                    results["warnings"].append("PDF contains embedded files")
+            # Check for suspicious content
+            found = {_PDF_MARKER_WARNINGS[m] for m in _PDF_MARKER_RE.findall(content)}
+            results["warnings"].extend(
+                warning for warning in dict.fromkeys(_PDF_MARKER_WARNINGS.values()) if warning in found
+            )
             
             results["is_valid"] = True
             results["file_info"] = {
@@ -325,7 +373,7 @@ class APIKeyManager:
     @staticmethod
     def hash_api_key(api_key: str) -> str:
         """Create hash of API key for logging/tracking without exposing key"""
-        return hashlib.sha256(api_key.encode()).hexdigest()[:16]
+        return hashlib.blake2b(api_key.encode(), digest_size=8).hexdigest()
 
 class SecureEnvironment:
     """Secure environment variable handling"""
@@ -381,7 +429,7 @@ def generate_session_token() -> str:
 def verify_file_integrity(file_path: str) -> bool:
     """Verify file hasn't been tampered with"""
     try:
-        # Basic integrity check
-        return Path(file_path).exists() and Path(file_path).stat().st_size > 0
+        # Basic integrity check; a missing file raises and is reported as False
+        return os.stat(file_path).st_size > 0
     except Exception:
         return False
\ No newline at end of file
@@ -0,0 +1,98 @@
+#!/usr/bin/env python3
+"""
+Tests for utils.batching.MicroBatcher
+"""
+import asyncio
+import sys
+
+# Add current directory to path
+sys.path.append('.')
+
+from utils.batching import MicroBatcher
+
+def test_results_keep_submission_order():
+    async def run():
+        async def double(items):
+            return [item * 2 for item in items]
+
+        batcher = MicroBatcher(double, max_batch_size=16, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(10)))
+        await batcher.stop()
+        return results
+
+    assert asyncio.run(run()) == [i * 2 for i in range(10)]
+
+def test_exception_result_fails_only_its_item():
+    async def run():
+        async def reject_odd(items):
+            return [ValueError(item) if item % 2 else item for item in items]
+
+        batcher = MicroBatcher(reject_odd, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(4)), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    results = asyncio.run(run())
+    assert results[0] == 0 and results[2] == 2
+    assert isinstance(results[1], ValueError) and isinstance(results[3], ValueError)
+
+def test_handler_failure_fails_whole_batch():
+    async def run():
+        async def broken(items):
+            raise RuntimeError("handler down")
+
+        batcher = MicroBatcher(broken, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(3)), return_exceptions=True)
+        await batcher.stop()
+        return results
+
+    assert all(isinstance(result, RuntimeError) for result in asyncio.run(run()))
+
+def test_batches_split_at_max_batch_size():
+    batch_sizes = []
+
+    async def run():
+        async def record(items):
+            batch_sizes.append(len(items))
+            return items
+
+        batcher = MicroBatcher(record, max_batch_size=3, max_wait=0.01)
+        results = await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+        await batcher.stop()
+        return results
+
+    assert asyncio.run(run()) == list(range(7))
+    assert batch_sizes == [3, 3, 1]
+
+def test_stop_completes_inflight_batch():
+    async def run():
+        started = asyncio.Event()
+        release = asyncio.Event()
+
+        async def slow(items):
+            started.set()
+            await release.wait()
+            return items
+
+        batcher = MicroBatcher(slow, max_wait=0.01)
+        submitted = asyncio.ensure_future(batcher.submit("x"))
+        await started.wait()
+
+        # Stop while the handler is running, then let the handler return
+        stopping = asyncio.ensure_future(batcher.stop())
+        await asyncio.sleep(0)
+        release.set()
+        await stopping
+        return await asyncio.wait_for(submitted, timeout=1)
+
+    assert asyncio.run(run()) == "x"
+
+def main():
+    """Run all tests"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
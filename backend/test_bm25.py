@@ -0,0 +1,104 @@
+#!/usr/bin/env python3
+"""
+Tests for utils.bm25.IncrementalBM25 against rank_bm25.BM25Okapi
+"""
+import pickle
+import sys
+import threading
+
+import numpy as np
+from rank_bm25 import BM25Okapi
+
+# Add current directory to path
+sys.path.append('.')
+
+from utils.bm25 import IncrementalBM25
+
+CORPUS = [
+    "the accused confessed to the police officer".split(),
+    "a confession to a police officer is not admissible".split(),
+    "the court examined the confession under section 25 of the evidence act".split(),
+    "bail may be granted under section 437 of the code".split(),
+    "the accused was found with stolen property".split(),
+    "the burden of proof lies on the prosecution".split(),
+    "section 302 of the penal code punishes murder".split(),
+    "the the the court".split(),
+]
+
+QUERIES = [
+    "confession police".split(),
+    "section code".split(),
+    "the accused".split(),          # "the" is common enough for a negative idf
+    "section section bail".split(),  # repeated terms count twice
+    "unknown words only".split(),
+    [],
+]
+
+def assert_matches_okapi(bm25: IncrementalBM25, corpus):
+    reference = BM25Okapi(corpus)
+    for query in QUERIES:
+        np.testing.assert_allclose(bm25.get_scores(query), reference.get_scores(query), rtol=1e-9, atol=1e-12)
+
+def test_bulk_add_matches_bm25okapi():
+    bm25 = IncrementalBM25()
+    bm25.add(CORPUS)
+    assert bm25.corpus_size == len(CORPUS)
+    assert_matches_okapi(bm25, CORPUS)
+
+def test_incremental_adds_match_bm25okapi():
+    bm25 = IncrementalBM25()
+    # Score between adds so cached arrays have to be invalidated
+    for end in (3, 4, 7, len(CORPUS)):
+        bm25.add(CORPUS[bm25.corpus_size:end])
+        assert_matches_okapi(bm25, CORPUS[:end])
+
+def test_pickle_round_trip():
+    bm25 = IncrementalBM25()
+    bm25.add(CORPUS[:5])
+    bm25.get_scores(QUERIES[0])  # populate the derived caches
+
+    restored = pickle.loads(pickle.dumps(bm25))
+    assert restored._posting_arrays == {} and restored._norm is None
+    assert_matches_okapi(restored, CORPUS[:5])
+
+    restored.add(CORPUS[5:])
+    assert_matches_okapi(restored, CORPUS)
+
+def test_scoring_concurrent_with_adds():
+    bm25 = IncrementalBM25()
+    bm25.add(CORPUS[:1])
+    done = threading.Event()
+    errors = []
+
+    def score():
+        while not done.is_set():
+            try:
+                for query in QUERIES:
+                    bm25.get_scores(query)
+            except Exception as e:
+                errors.append(e)
+                return
+
+    scorer = threading.Thread(target=score)
+    scorer.start()
+    try:
+        for _ in range(200):
+            for doc in CORPUS:
+                bm25.add([doc])
+    finally:
+        done.set()
+        scorer.join()
+
+    assert not errors
+    # Caches left behind by the scorer must cover the whole corpus
+    assert_matches_okapi(bm25, CORPUS[:1] + CORPUS * 200)
+
+def main():
+    """Run all tests"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+#!/usr/bin/env python3
+"""
+Tests for PremiumFallbackLLM.generate_answer_stream
+"""
+import asyncio
+import os
+import sys
+
+import httpx
+
+# Add current directory to path
+sys.path.append('.')
+
+import llm_http
+from premium_fallback_llm import PremiumFallbackLLM
+
+FIRST_EVENT = b'data: {"choices": [{"delta": {"content": "Section 25 "}}]}\n\n'
+
+class _FailingStream(httpx.AsyncByteStream):
+    """SSE body that sends `events`, then drops the connection"""
+
+    def __init__(self, events):
+        self.events = events
+
+    async def __aiter__(self):
+        for event in self.events:
+            yield event
+        raise httpx.ReadError("connection reset")
+
+def _run_stream(events):
+    """Collect (deltas, raised exception, fallback calls) for one streamed answer"""
+    async def run():
+        transport = httpx.MockTransport(lambda request: httpx.Response(200, stream=_FailingStream(events)))
+        llm_http._client = httpx.AsyncClient(transport=transport)
+        os.environ["OPENAI_API_KEY"] = "sk-test"
+        llm = PremiumFallbackLLM()
+
+        fallback_calls = []
+
+        async def generate_answer(question, sources, language):
+            fallback_calls.append(question)
+            return {"text": "complete fallback answer"}
+
+        llm.generate_answer = generate_answer
+
+        deltas = []
+        error = None
+        try:
+            async for delta in llm.generate_answer_stream("What does Section 25 say?"):
+                deltas.append(delta)
+        except httpx.HTTPError as e:
+            error = e
+        finally:
+            await llm_http.close_client()
+        return deltas, error, fallback_calls
+
+    return asyncio.run(run())
+
+def test_error_after_first_delta_is_raised_without_fallback():
+    deltas, error, fallback_calls = _run_stream([FIRST_EVENT])
+    assert deltas == ["Section 25 "]
+    assert isinstance(error, httpx.ReadError)
+    assert fallback_calls == []
+
+def test_error_before_any_delta_falls_back_once():
+    deltas, error, fallback_calls = _run_stream([])
+    assert deltas == ["complete fallback answer"]
+    assert error is None
+    assert len(fallback_calls) == 1
+
+def main():
+    """Run all tests"""
+    tests = [value for name, value in sorted(globals().items()) if name.startswith("test_")]
+    for test in tests:
+        test()
+        print(f"✅ {test.__name__}")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,35 @@
+"""
+Asyncio helpers for running blocking work without stalling the event loop
+"""
+import asyncio
+import contextvars
+import functools
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Optional
+
+async def run_blocking(func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+    """
+    Run a blocking callable in the default thread pool
+
+    Equivalent to asyncio.to_thread (Python 3.9+), kept here so the backend
+    still runs on older interpreters. Context variables are propagated to
+    the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    call = functools.partial(ctx.run, func, *args, **kwargs)
+    return await loop.run_in_executor(None, call)
+
+def configure_default_executor(max_workers: Optional[int] = None) -> ThreadPoolExecutor:
+    """
+    Install a bounded default executor on the running loop
+
+    Python 3.7 sizes the default pool at cpu_count * 5, which oversubscribes
+    the CPU when the workers run model forward passes. Call once at startup.
+    """
+    if max_workers is None:
+        max_workers = min(32, (os.cpu_count() or 1) + 4)
+    executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="blocking")
+    asyncio.get_running_loop().set_default_executor(executor)
+    return executor
@@ -0,0 +1,104 @@
+"""
+Micro-batching for coalescing concurrent async requests
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+class MicroBatcher:
+    """
+    Coalesce items submitted within a short window into one handler call
+
+    The handler receives a list of items and must return a list of results
+    in the same order. A result that is an exception instance is raised to
+    that item's caller only.
+    """
+
+    def __init__(
+        self,
+        handler: Callable[[List[Any]], Awaitable[List[Any]]],
+        max_batch_size: int = 16,
+        max_wait: float = 0.02
+    ):
+        self.handler = handler
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait
+        self._pending: List[Tuple[Any, asyncio.Future]] = []
+        self._wakeup: Optional[asyncio.Event] = None
+        self._task: Optional[asyncio.Task] = None
+        # Batch currently in the handler, if any
+        self._inflight: Optional[asyncio.Task] = None
+
+    def start(self):
+        """Start the background flush task on the running loop"""
+        if self._task is None or self._task.done():
+            self._wakeup = asyncio.Event()
+            self._task = asyncio.get_running_loop().create_task(self._run())
+
+    async def stop(self):
+        """Flush outstanding items and stop the background task"""
+        if self._task is None:
+            return
+        self._task.cancel()
+        try:
+            await self._task
+        except asyncio.CancelledError:
+            pass
+        self._task = None
+        # Cancelling the loop does not cancel a batch already handed to the
+        # handler; let it finish so its callers get their results
+        if self._inflight is not None:
+            await asyncio.gather(self._inflight, return_exceptions=True)
+            self._inflight = None
+        while self._pending:
+            await self._flush()
+
+    async def submit(self, item: Any) -> Any:
+        """Queue an item and wait for its result"""
+        self.start()
+        future = asyncio.get_running_loop().create_future()
+        self._pending.append((item, future))
+        if len(self._pending) == 1 or len(self._pending) >= self.max_batch_size:
+            self._wakeup.set()
+        return await future
+
+    async def _run(self):
+        while True:
+            await self._wakeup.wait()
+            self._wakeup.clear()
+
+            # Give other callers a short window to join the batch
+            if len(self._pending) < self.max_batch_size:
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), timeout=self.max_wait)
+                except asyncio.TimeoutError:
+                    pass
+                self._wakeup.clear()
+
+            while self._pending:
+                # Shielded: _flush has already taken its items off _pending,
+                # so cancelling it would strand their futures
+                self._inflight = asyncio.get_running_loop().create_task(self._flush())
+                await asyncio.shield(self._inflight)
+                self._inflight = None
+
+    async def _flush(self):
+        batch = self._pending[:self.max_batch_size]
+        del self._pending[:self.max_batch_size]
+
+        items = [item for item, _ in batch]
+        try:
+            results = await self.handler(items)
+        except Exception as e:
+            logger.error("Batch handler failed for %d items: %s", len(items), e)
+            results = [e] * len(items)
+
+        for (_, future), result in zip(batch, results):
+            if future.done():
+                continue
+            if isinstance(result, BaseException):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
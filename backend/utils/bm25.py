@@ -0,0 +1,133 @@
+"""
+Incrementally updatable BM25 index with vectorized scoring
+"""
+import threading
+from collections import Counter
+from typing import Dict, Iterable, List, Optional, Tuple
+
+import numpy as np
+
+class IncrementalBM25:
+    """
+    BM25 over an inverted index that grows one document at a time
+
+    add() costs O(tokens in the new documents); nothing already indexed is
+    re-tokenized. IDF and length normalisation are derived from the current
+    counts at query time, so scores always reflect the whole corpus.
+    get_scores() matches rank_bm25.BM25Okapi, interface and scores: one
+    score per document, in insertion order, with Okapi idf and negative
+    idfs floored at epsilon times the average idf.
+
+    add() and get_scores() may be called from different threads; they
+    share one lock, so scoring never caches arrays for a half-added batch.
+    """
+
+    def __init__(self, k1: float = 1.5, b: float = 0.75, epsilon: float = 0.25):
+        self.k1 = k1
+        self.b = b
+        self.epsilon = epsilon
+        self._vocab: Dict[str, int] = {}
+        self._postings: List[List[int]] = []  # term id -> doc ids
+        self._tfs: List[List[int]] = []  # term id -> term frequency per posting
+        self._doc_len: List[int] = []
+        self._total_len = 0
+        # Derived arrays, rebuilt lazily after add()
+        self._posting_arrays: Dict[int, Tuple[np.ndarray, np.ndarray]] = {}
+        self._norm: Optional[np.ndarray] = None
+        self._idf: Optional[np.ndarray] = None  # term id -> idf
+        self._lock = threading.Lock()
+
+    @property
+    def corpus_size(self) -> int:
+        return len(self._doc_len)
+
+    def add(self, tokenized_docs: Iterable[List[str]]):
+        """Append documents (already tokenized) to the index"""
+        # Consume the iterable before taking the lock
+        tokenized_docs = list(tokenized_docs)
+        with self._lock:
+            self._add_locked(tokenized_docs)
+
+    def _add_locked(self, tokenized_docs: List[List[str]]):
+        touched = set()
+        for tokens in tokenized_docs:
+            doc_id = len(self._doc_len)
+            self._doc_len.append(len(tokens))
+            self._total_len += len(tokens)
+
+            for term, tf in Counter(tokens).items():
+                term_id = self._vocab.setdefault(term, len(self._vocab))
+                if term_id == len(self._postings):
+                    self._postings.append([])
+                    self._tfs.append([])
+                self._postings[term_id].append(doc_id)
+                self._tfs[term_id].append(tf)
+                touched.add(term_id)
+
+        for term_id in touched:
+            self._posting_arrays.pop(term_id, None)
+        self._norm = None
+        self._idf = None
+
+    def get_scores(self, query_tokens: List[str]) -> np.ndarray:
+        """BM25 score of every document for the query"""
+        with self._lock:
+            return self._get_scores_locked(query_tokens)
+
+    def _get_scores_locked(self, query_tokens: List[str]) -> np.ndarray:
+        n_docs = len(self._doc_len)
+        scores = np.zeros(n_docs)
+        if n_docs == 0:
+            return scores
+
+        norm = self._norm
+        if norm is None:
+            avgdl = self._total_len / n_docs or 1.0
+            doc_len = np.asarray(self._doc_len[:n_docs], dtype=np.float64)
+            norm = self._norm = self.k1 * (1 - self.b + self.b * doc_len / avgdl)
+
+        idf = self._idf
+        if idf is None:
+            doc_freq = np.fromiter(map(len, self._postings), dtype=np.float64, count=len(self._postings))
+            idf = np.log((n_docs - doc_freq + 0.5) / (doc_freq + 0.5))
+            # Average over all terms before flooring, as BM25Okapi does
+            idf[idf < 0] = self.epsilon * idf.mean()
+            self._idf = idf
+
+        # Repeated query terms count again, as in rank_bm25
+        for term in query_tokens:
+            term_id = self._vocab.get(term)
+            if term_id is None:
+                continue
+
+            docs, tf = self._postings_for(term_id)
+            # A term's postings hold distinct doc ids, so fancy-index += is safe
+            scores[docs] += idf[term_id] * tf * (self.k1 + 1) / (tf + norm[docs])
+
+        return scores
+
+    def _postings_for(self, term_id: int) -> Tuple[np.ndarray, np.ndarray]:
+        arrays = self._posting_arrays.get(term_id)
+        if arrays is None:
+            arrays = (
+                np.asarray(self._postings[term_id], dtype=np.int64),
+                np.asarray(self._tfs[term_id], dtype=np.float64)
+            )
+            self._posting_arrays[term_id] = arrays
+        return arrays
+
+    def __getstate__(self):
+        # Derived arrays are cheap to rebuild; keep pickles to the raw counts
+        state = self.__dict__.copy()
+        state["_posting_arrays"] = {}
+        state["_norm"] = None
+        state["_idf"] = None
+        del state["_lock"]
+        return state
+
+    def __setstate__(self, state):
+        # Pickles from before epsilon existed
+        state.setdefault("epsilon", 0.25)
+        state.setdefault("_idf", None)
+        self.__dict__.update(state)
+        self._lock = threading.Lock()
@@ -0,0 +1,160 @@
+"""
+In-memory caching utilities shared by the LLM and retrieval layers
+"""
+import time
+from collections import OrderedDict
+from typing import Any, Dict, Hashable, Optional
+
+import numpy as np
+
+class LRUCache:
+    """
+    Bounded LRU cache with optional per-entry TTL
+
+    Not thread-safe; intended for use from a single event loop where
+    get/put never yield control.
+    """
+
+    def __init__(self, maxsize: int = 1000, ttl: Optional[float] = None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key: Hashable) -> Optional[Any]:
+        """Return cached value or None, refreshing its LRU position"""
+        entry = self._data.get(key)
+        if entry is None:
+            self.misses += 1
+            return None
+
+        stored_at, value = entry
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            del self._data[key]
+            self.misses += 1
+            return None
+
+        self._data.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, value: Any):
+        """Insert or replace a value, evicting the least recently used entry"""
+        if self.maxsize <= 0:
+            return
+
+        self._data[key] = (time.monotonic(), value)
+        self._data.move_to_end(key)
+
+        while len(self._data) > self.maxsize:
+            self._data.popitem(last=False)
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        self._data.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._data),
+            "maxsize": self.maxsize,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
+
+class SemanticCache:
+    """
+    Similarity-keyed cache over L2-normalised embeddings
+
+    Entries live in partitions (e.g. one per retrieved source set and
+    language) and a lookup only compares against its own partition, so a
+    near-identical question is answered from cache only when it was
+    grounded in the same sources. Eviction is LRU across all partitions.
+    """
+
+    def __init__(self, maxsize: int = 10000, ttl: Optional[float] = None, threshold: float = 0.95):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.threshold = threshold
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._partitions: Dict[Hashable, Dict[Hashable, None]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, partition: Hashable, vector: np.ndarray) -> Optional[Any]:
+        """Return the value of the most similar entry above threshold, or None"""
+        members = self._partitions.get(partition)
+        if not members:
+            self.misses += 1
+            return None
+
+        keys = list(members)
+        matrix = np.stack([self._entries[key][2] for key in keys])
+        scores = matrix @ vector
+        best = int(np.argmax(scores))
+
+        if scores[best] < self.threshold:
+            self.misses += 1
+            return None
+
+        key = keys[best]
+        stored_at, _, _, value = self._entries[key]
+        if self.ttl is not None and time.monotonic() - stored_at > self.ttl:
+            self._remove(key)
+            self.misses += 1
+            return None
+
+        self._entries.move_to_end(key)
+        self.hits += 1
+        return value
+
+    def put(self, key: Hashable, partition: Hashable, vector: np.ndarray, value: Any):
+        """Insert or replace an entry, evicting the least recently used"""
+        if self.maxsize <= 0:
+            return
+
+        if key in self._entries:
+            self._remove(key)
+        self._entries[key] = (time.monotonic(), partition, np.asarray(vector, dtype=np.float32), value)
+        self._partitions.setdefault(partition, {})[key] = None
+
+        while len(self._entries) > self.maxsize:
+            self._remove(next(iter(self._entries)))
+
+    def _remove(self, key: Hashable):
+        _, partition, _, _ = self._entries.pop(key)
+        members = self._partitions.get(partition)
+        if members is not None:
+            members.pop(key, None)
+            if not members:
+                del self._partitions[partition]
+
+    def clear(self):
+        """Drop all entries and reset counters"""
+        self._entries.clear()
+        self._partitions.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def stats(self) -> Dict[str, Any]:
+        """Get cache statistics"""
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "maxsize": self.maxsize,
+            "threshold": self.threshold,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": self.hits / lookups if lookups else 0.0
+        }
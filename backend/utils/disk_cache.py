@@ -0,0 +1,98 @@
+"""
+SQLite-backed persistent cache tier shared across workers and restarts
+"""
+import logging
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Optional
+
+from utils import fastjson
+from utils.aio import run_blocking
+
+logger = logging.getLogger(__name__)
+
+class SQLiteCache:
+    """
+    Persistent key/value cache with TTL, storing JSON payloads
+
+    One connection guarded by a lock; the async wrappers run queries in the
+    default thread pool. WAL mode lets several worker processes share the
+    file. Failures are logged and treated as misses so the cache can never
+    break a request.
+    """
+
+    def __init__(self, path: str, ttl: Optional[float] = None):
+        self.path = Path(path)
+        self.ttl = ttl
+        self._lock = threading.Lock()
+
+        self.path.parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(str(self.path), check_same_thread=False, timeout=5.0)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("PRAGMA synchronous=NORMAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS cache ("
+            "namespace TEXT NOT NULL, key BLOB NOT NULL, payload BLOB NOT NULL, ts REAL NOT NULL, "
+            "PRIMARY KEY (namespace, key))"
+        )
+        self._conn.commit()
+
+    def get(self, namespace: str, key: bytes) -> Optional[Any]:
+        """Return the decoded payload, or None if missing or expired"""
+        try:
+            with self._lock:
+                row = self._conn.execute(
+                    "SELECT payload, ts FROM cache WHERE namespace = ? AND key = ?",
+                    (namespace, key)
+                ).fetchone()
+            if row is None:
+                return None
+
+            payload, stored_at = row
+            # Wall-clock time: entries outlive the process
+            if self.ttl is not None and time.time() - stored_at > self.ttl:
+                return None
+            return fastjson.loads(payload)
+        except Exception as e:
+            logger.warning("Disk cache read failed: %s", e)
+            return None
+
+    def put(self, namespace: str, key: bytes, value: Any):
+        """Store a JSON-serialisable value"""
+        try:
+            payload = fastjson.dumps(value)
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO cache (namespace, key, payload, ts) VALUES (?, ?, ?, ?)",
+                    (namespace, key, payload, time.time())
+                )
+                self._conn.commit()
+        except Exception as e:
+            logger.warning("Disk cache write failed: %s", e)
+
+    def purge_expired(self) -> int:
+        """Delete expired entries; returns the number removed"""
+        if self.ttl is None:
+            return 0
+        try:
+            with self._lock:
+                cursor = self._conn.execute(
+                    "DELETE FROM cache WHERE ts < ?", (time.time() - self.ttl,)
+                )
+                self._conn.commit()
+            return cursor.rowcount
+        except Exception as e:
+            logger.warning("Disk cache purge failed: %s", e)
+            return 0
+
+    async def aget(self, namespace: str, key: bytes) -> Optional[Any]:
+        return await run_blocking(self.get, namespace, key)
+
+    async def aput(self, namespace: str, key: bytes, value: Any):
+        await run_blocking(self.put, namespace, key, value)
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
@@ -0,0 +1,36 @@
+"""
+JSON helpers backed by orjson when installed, stdlib json otherwise
+"""
+import json
+from typing import Any, Union
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:
+    ORJSON_AVAILABLE = False
+
+# orjson.JSONDecodeError subclasses json.JSONDecodeError, so callers can
+# catch either
+if ORJSON_AVAILABLE:
+    JSONDecodeError = orjson.JSONDecodeError
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """Decode JSON from str or bytes"""
+        return orjson.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """Encode to compact UTF-8 JSON bytes"""
+        return orjson.dumps(obj)
+else:
+    JSONDecodeError = json.JSONDecodeError
+
+    def loads(data: Union[str, bytes, bytearray, memoryview]) -> Any:
+        """Decode JSON from str or bytes"""
+        if isinstance(data, memoryview):
+            data = data.tobytes()
+        return json.loads(data)
+
+    def dumps(obj: Any) -> bytes:
+        """Encode to compact UTF-8 JSON bytes"""
+        return json.dumps(obj, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
@@ -25,6 +25,9 @@ NON_BREAKING_SPACES = [
     '\u202f',  # Narrow no-break space
 ]
 
+# Runs of Devanagari codepoints (U+0900-U+097F)
+DEVANAGARI_RUN_RE = re.compile(r'[\u0900-\u097F]+')
+
 def normalize_text(text: str) -> str:
     """
     Normalize text for mixed Hindi/English content
@@ -78,10 +81,12 @@ def is_devanagari_text(text: str) -> bool:
     if not text:
         return False
     
-    # Devanagari Unicode range: U+0900-U+097F
-    devanagari_chars = sum(1 for char in text if 0x0900 <= ord(char) <= 0x097F)
-    total_chars = len([c for c in text if c.isalpha()])
+    # Count in C: regex runs for Devanagari, map() for alphabetic characters
+    devanagari_chars = sum(map(len, DEVANAGARI_RUN_RE.findall(text)))
+    if devanagari_chars == 0:
+        return False
     
+    total_chars = sum(map(str.isalpha, text))
     if total_chars == 0:
         return False
     
@@ -0,0 +1,34 @@
+"""
+Async rate limiting primitives for outbound API calls
+"""
+import asyncio
+import time
+from typing import Optional
+
+class AsyncTokenBucket:
+    """
+    Token bucket that makes callers wait for capacity instead of failing
+
+    Safe for concurrent use on one event loop: the refill/check/take
+    sequence in acquire() does not await, so it cannot interleave.
+    """
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self):
+        """Take one token, sleeping until one is available"""
+        while True:
+            self._refill()
+            if self._tokens >= 1:
+                self._tokens -= 1
+                return
+            await asyncio.sleep((1 - self._tokens) / self.rate)